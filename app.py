@@ -3,106 +3,2336 @@ College Chatbot Web Application
 Flask Backend with Authentication and Role-Based Access
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, has_app_context, make_response, stream_with_context
+from flask import before_render_template, template_rendered
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SecureCookieSession, SecureCookieSessionInterface
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
+from markupsafe import Markup
 import sqlite3
 import os
 import re
 import json
+import time
+import hashlib
+import threading
+import csv
+import codecs
+import math
+import functools
+import html
+import tempfile
+import multiprocessing
+import secrets
+import click
+from collections import namedtuple, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from types import MappingProxyType
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Without Pillow photos are still stored and served, just not resized
+    Image = None
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production-2024'
 app.config['UPLOAD_FOLDER'] = 'static/images'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['PHOTO_VARIANT_SIZES'] = {'thumb': 100, 'medium': 300}  # square WebP sizes made for each photo
+app.config['PHOTO_MAX_AGE'] = 365 * 24 * 3600  # content-addressed photos never change
+app.config['DATABASE'] = 'college.db'
+app.config['DB_BUSY_TIMEOUT'] = 5000  # milliseconds to wait on a locked database
+app.config['DB_MMAP_SIZE'] = 64 * 1024 * 1024  # bytes of the database file to memory-map
+app.config['CHATBOT_INTENTS_FILE'] = 'data/chatbot_intents.json'
+app.config['CHATBOT_RELOAD_INTERVAL'] = 2.0  # seconds between data file checks
+app.config['CHATBOT_ABOUT_PAGE'] = 'templates/about.html'  # also indexed for passage retrieval
+app.config['CHATBOT_WORDS_FILE'] = 'data/english_words.txt'  # real words that are never corrected as typos
+app.config['CHATBOT_INDEX_FILE'] = 'chatbot_index.json'  # persisted passage index
+app.config['CHATBOT_PASSAGE_MIN_SCORE'] = 1.5  # BM25 score needed to answer without a keyword match
+app.config['CHATBOT_CACHE_SIZE'] = 4096  # serialized public chatbot answers kept in memory
+app.config['PUBLIC_PAGE_MAX_AGE'] = 300  # seconds proxies and browsers may reuse the public chatbot page
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 7 * 24 * 3600  # static URLs carry a version, see static_url_version
+app.config['PROFILE_CACHE_SIZE'] = 1024  # parsed student profiles kept in memory
+app.config['PROFILE_CACHE_TTL'] = 300  # seconds
+app.config['DASHBOARD_PAGE_SIZE'] = 50  # students per teacher dashboard page
+app.config['DASHBOARD_ROW_CACHE_SIZE'] = 5000  # rendered student table rows kept in memory
+app.config['IMPORT_MAX_ERRORS'] = 200  # row errors reported back from a bulk import
+app.config['HASH_WORKERS'] = None  # processes used for password hashing; None shares the CPUs, see pool_workers
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt'  # Werkzeug method for new password hashes
+app.config['PASSWORD_REHASH_ON_LOGIN'] = True  # upgrade outdated hashes after a successful login
+app.config['LOGIN_OFFLOAD_HASHING'] = False  # verify login passwords in a process pool
+app.config['LOGIN_VERIFY_WORKERS'] = None  # None shares the CPUs between server processes
+app.config['LOGIN_VERIFY_MAX_PENDING'] = 64  # queued + running verifications before shedding load
+app.config['LOGIN_VERIFY_TIMEOUT'] = 10  # seconds
+app.config['RATE_LIMIT_ENABLED'] = True  # throttle the chatbot message endpoints
+app.config['RATE_LIMIT_IP'] = (1.0, 30)  # (messages per second, burst) per client IP for anonymous visitors
+app.config['RATE_LIMIT_SESSION'] = (0.5, 15)  # (messages per second, burst) per logged-in user
+app.config['RATE_LIMIT_SHARED'] = False  # keep buckets in the database so limits hold across worker processes
+app.config['RATE_LIMIT_MAX_KEYS'] = 50000  # in-memory buckets before the least recently used are dropped
+app.config['SESSION_BACKEND'] = 'sqlite'  # 'sqlite' keeps session data server-side, 'cookie' uses Flask's signed cookie
+app.config['SESSION_CACHE_SIZE'] = 10000  # sessions kept in memory in front of the sessions table
+app.config['SESSION_CACHE_TTL'] = 30  # seconds another worker may keep serving a revoked session
+app.config['SESSION_SWEEP_INTERVAL'] = 300  # seconds between deletions of expired sessions
+app.config['PROXY_FIX_HOPS'] = 0  # reverse proxies in front of the app whose X-Forwarded-* headers are trusted
+app.config['METRICS_TOKEN'] = None  # bearer token Prometheus sends to read /metrics
+app.config['METRICS_ALLOWED_IPS'] = None  # scraper addresses allowed without a token; None means localhost, or none behind a proxy
+app.config['SERVER_WORKERS'] = os.cpu_count() or 2  # processes started by `flask serve`
+app.config['SERVER_THREADS'] = 8  # threads per worker process
+app.config['WORKER_PROCESSES'] = 1  # server processes sharing this machine's CPUs; `flask serve` sets it
+
+# Deployment settings (SECRET_KEY, DATABASE, ...) from a Python file; loaded
+# before anything below reads the config
+app.config.from_envvar('COLLEGE_CHATBOT_SETTINGS', silent=True)
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Database initialization
+def init_db():
+    """Create or upgrade the database schema
+
+    ``PRAGMA user_version`` counts the MIGRATIONS already applied, so an
+    up-to-date database costs one read and no write lock. Pending
+    migrations run together in a single transaction.
+    """
+    conn = sqlite3.connect(
+        app.config['DATABASE'], timeout=app.config['DB_BUSY_TIMEOUT'] / 1000, isolation_level=None
+    )
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > len(MIGRATIONS):
+            raise RuntimeError(f'Database schema version {version} is newer than this app ({len(MIGRATIONS)})')
+        if version == len(MIGRATIONS):
+            return
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for migration in MIGRATIONS[version:]:
+                migration(conn)
+            conn.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.close()
+
+def run_script(conn, script):
+    """Run a SQL script statement by statement
+
+    Unlike ``executescript()`` this does not commit first, so the script
+    joins the migration's transaction.
+    """
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+
+# Columns added to users after its first release, in the order they were added
+USER_ADDED_COLUMNS = (
+    ('semester_marks', 'TEXT'),
+    ('arrears', 'TEXT'),
+    ('notes_link', 'TEXT'),
+    ('subject_notes', 'TEXT'),
+    ('age', 'INTEGER'),
+    ('blood_group', 'TEXT'),
+    ('parent_details', 'TEXT'),
+    ('chatbot_questions', 'TEXT'),
+    ('subjects', 'TEXT'),
+    ('version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('updated_at', 'TIMESTAMP')
+)
+
+def migrate_base_schema(conn):
+    """Migration 1: every table up to this runner, including databases made before it"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email_phone TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('student', 'teacher')),
+            name TEXT,
+            roll_number TEXT,
+            department TEXT,
+            photo_path TEXT,
+            semester_marks TEXT,
+            arrears TEXT,
+            notes_link TEXT,
+            subject_notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(users)')}
+    for column, definition in USER_ADDED_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE users ADD COLUMN {column} {definition}')
+    
+    # Per-student academic records (replace the JSON TEXT columns on users)
+    run_script(conn, '''
+        CREATE TABLE IF NOT EXISTS marks (
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            semester TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (student_id, semester, subject)
+        );
+        CREATE TABLE IF NOT EXISTS arrears (
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            subject TEXT NOT NULL,
+            status TEXT,
+            PRIMARY KEY (student_id, subject)
+        );
+        CREATE TABLE IF NOT EXISTS subjects (
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            subject TEXT NOT NULL,
+            PRIMARY KEY (student_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS subject_notes (
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            subject TEXT NOT NULL,
+            link TEXT NOT NULL,
+            PRIMARY KEY (student_id, subject)
+        );
+        CREATE TABLE IF NOT EXISTS chatbot_qa (
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            PRIMARY KEY (student_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS chatbot_qa_terms (
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            term TEXT NOT NULL,
+            PRIMARY KEY (student_id, term, position)
+        );
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department TEXT,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS question_bank_terms (
+            bank_id INTEGER NOT NULL REFERENCES question_bank(id) ON DELETE CASCADE,
+            term TEXT NOT NULL,
+            PRIMARY KEY (term, bank_id)
+        );
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            allowed INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            data TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+    ''')
+    create_users_search_index(conn)
+    create_change_tracking(conn)
+    migrate_json_columns(conn)
+    backfill_qa_terms(conn)
+
+def migrate_hot_query_indexes(conn):
+    """Migration 2: indexes behind the dashboard, login, session and search queries"""
+    run_script(conn, '''
+        CREATE INDEX IF NOT EXISTS idx_users_role_created ON users(role, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_users_roll_number ON users(roll_number);
+        CREATE INDEX IF NOT EXISTS idx_question_bank_department ON question_bank(department);
+        CREATE INDEX IF NOT EXISTS idx_subjects_subject ON subjects(subject);
+        CREATE INDEX IF NOT EXISTS idx_arrears_status ON arrears(status);
+        CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires);
+    ''')
+    # Give the query planner statistics for the new indexes
+    conn.execute('ANALYZE')
+
+def migrate_question_bank_version(conn):
+    """Migration 3: a version stamp for the question bank and normalized department keys"""
+    run_script(conn, '''
+        CREATE TABLE IF NOT EXISTS question_bank_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO question_bank_version (id, value) VALUES (1, 0);
+        CREATE TRIGGER IF NOT EXISTS question_bank_version_ai AFTER INSERT ON question_bank BEGIN
+            UPDATE question_bank_version SET value = value + 1 WHERE id = 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS question_bank_version_au AFTER UPDATE ON question_bank BEGIN
+            UPDATE question_bank_version SET value = value + 1 WHERE id = 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS question_bank_version_ad AFTER DELETE ON question_bank BEGIN
+            UPDATE question_bank_version SET value = value + 1 WHERE id = 1;
+        END;
+    ''')
+    rows = conn.execute('SELECT id, department FROM question_bank WHERE department IS NOT NULL').fetchall()
+    conn.executemany(
+        'UPDATE question_bank SET department = ? WHERE id = ?',
+        [(normalize_department(row[1]) or None, row[0]) for row in rows]
+    )
+
+def migrate_batched_change_versions(conn):
+    """Migration 4: let bulk writes pause the per-row version triggers
+
+    While ``change_counter.paused`` is set, writes to the tracked tables
+    leave users.version alone and the writer stamps each student once,
+    see stamp_change_versions.
+    """
+    conn.execute('ALTER TABLE change_counter ADD COLUMN paused INTEGER NOT NULL DEFAULT 0')
+    statements = []
+    for table in CHANGE_TRACKED_TABLES:
+        for event, action, row in (('ai', 'INSERT', 'new'), ('au', 'UPDATE', 'new'), ('ad', 'DELETE', 'old')):
+            statements.append(f'''
+                DROP TRIGGER IF EXISTS {table}_version_{event};
+                CREATE TRIGGER {table}_version_{event} AFTER {action} ON {table}
+                WHEN (SELECT paused FROM change_counter WHERE id = 1) = 0
+                BEGIN{VERSION_BUMP.format(row=row, column='student_id')}END;
+            ''')
+    run_script(conn, ''.join(statements))
+
+# Applied in order; never edit or reorder a released migration, append a new one
+MIGRATIONS = (
+    migrate_base_schema,
+    migrate_hot_query_indexes,
+    migrate_question_bank_version,
+    migrate_batched_change_versions
+)
+
+def backfill_qa_terms(conn):
+    """Index custom Q&A saved before chatbot_qa_terms existed"""
+    rows = conn.execute('''
+        SELECT student_id, position, question FROM chatbot_qa
+        WHERE student_id NOT IN (SELECT DISTINCT student_id FROM chatbot_qa_terms)
+    ''').fetchall()
+    conn.executemany(
+        'INSERT OR IGNORE INTO chatbot_qa_terms (student_id, position, term) VALUES (?, ?, ?)',
+        [(row[0], row[1], term) for row in rows for term in tokenize_text(row[2])]
+    )
+
+def create_users_search_index(conn):
+    """Create the FTS5 index used by teacher dashboard search, if supported"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+    ).fetchone()
+    if exists:
+        return
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE users_fts USING fts5(
+                name, roll_number, department, content='users', content_rowid='id'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; search falls back to LIKE
+        return
+    run_script(conn, '''
+        CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts (rowid, name, roll_number, department)
+            VALUES (new.id, new.name, new.roll_number, new.department);
+        END;
+        CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, roll_number, department)
+            VALUES ('delete', old.id, old.name, old.roll_number, old.department);
+        END;
+        CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF name, roll_number, department ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, roll_number, department)
+            VALUES ('delete', old.id, old.name, old.roll_number, old.department);
+            INSERT INTO users_fts (rowid, name, roll_number, department)
+            VALUES (new.id, new.name, new.roll_number, new.department);
+        END;
+        INSERT INTO users_fts (users_fts) VALUES ('rebuild');
+    ''')
+
+# Tables whose rows belong to a student; a write to any of them counts as a change to that student
+CHANGE_TRACKED_TABLES = ('marks', 'arrears', 'subjects', 'subject_notes', 'chatbot_qa')
+
+# Trigger body stamping the user {row}.{column} with the next change version
+VERSION_BUMP = '''
+            UPDATE change_counter SET value = value + 1 WHERE id = 1;
+            UPDATE users SET version = (SELECT value FROM change_counter WHERE id = 1),
+                updated_at = CURRENT_TIMESTAMP WHERE id = {row}.{column};
+    '''
+
+def create_change_tracking(conn):
+    """Create the global change counter and the triggers that stamp users.version
+
+    Every write to a user, or to one of their records, takes the next value
+    of ``change_counter`` as the user's ``version``, so "what changed since
+    version X" is ``WHERE version > X``. Deleted users leave a row in
+    ``deleted_users`` with the version of the deletion.
+    """
+    statements = ['''
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO change_counter (id, value) VALUES (1, 0);
+        CREATE TABLE IF NOT EXISTS deleted_users (
+            user_id INTEGER PRIMARY KEY,
+            role TEXT,
+            version INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_version ON users(version);
+        CREATE INDEX IF NOT EXISTS idx_deleted_users_version ON deleted_users(version);
+    ''']
+    statements.append(f'''
+        CREATE TRIGGER IF NOT EXISTS users_version_ai AFTER INSERT ON users BEGIN{VERSION_BUMP.format(row='new', column='id')}END;
+        CREATE TRIGGER IF NOT EXISTS users_version_au AFTER UPDATE ON users
+        WHEN new.version IS old.version BEGIN{VERSION_BUMP.format(row='new', column='id')}END;
+        CREATE TRIGGER IF NOT EXISTS users_version_ad AFTER DELETE ON users BEGIN
+            UPDATE change_counter SET value = value + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO deleted_users (user_id, role, version)
+            VALUES (old.id, old.role, (SELECT value FROM change_counter WHERE id = 1));
+        END;
+    ''')
+    for table in CHANGE_TRACKED_TABLES:
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_version_ai AFTER INSERT ON {table} BEGIN{VERSION_BUMP.format(row='new', column='student_id')}END;
+            CREATE TRIGGER IF NOT EXISTS {table}_version_au AFTER UPDATE ON {table} BEGIN{VERSION_BUMP.format(row='new', column='student_id')}END;
+            CREATE TRIGGER IF NOT EXISTS {table}_version_ad AFTER DELETE ON {table} BEGIN{VERSION_BUMP.format(row='old', column='student_id')}END;
+        ''')
+    run_script(conn, ''.join(statements))
+
+def current_change_version(conn):
+    """Latest value of the global change counter"""
+    row = conn.execute('SELECT value FROM change_counter WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+def stamp_change_versions(conn, sql, params, student_ids):
+    """Run a bulk write with the version triggers paused, then stamp each student once
+
+    Per row, the triggers cost two extra UPDATEs; here the whole statement
+    costs one UPDATE per student. Students still get distinct versions, so
+    /teacher/changes never splits a page between equal versions. Call it
+    inside a transaction.
+    """
+    conn.execute('UPDATE change_counter SET paused = 1 WHERE id = 1')
+    conn.executemany(sql, params)
+    conn.execute('UPDATE change_counter SET paused = 0 WHERE id = 1')
+    base = current_change_version(conn)
+    conn.executemany(
+        'UPDATE users SET version = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+        [(base + n, student_id) for n, student_id in enumerate(sorted(student_ids), 1)]
+    )
+    conn.execute('UPDATE change_counter SET value = value + ? WHERE id = 1', (len(student_ids),))
+
+def migrate_json_columns(conn, batch_size=200):
+    """Move legacy JSON TEXT columns on users into the child tables
+
+    Reads in batches to bound memory; the caller's transaction covers
+    the whole move. Migrated columns are set to NULL, which makes the
+    migration safe to re-run.
+    """
+    while True:
+        rows = conn.execute('''
+            SELECT id, semester_marks, arrears, subjects, subject_notes, chatbot_questions
+            FROM users
+            WHERE semester_marks IS NOT NULL OR arrears IS NOT NULL OR subjects IS NOT NULL
+               OR subject_notes IS NOT NULL OR chatbot_questions IS NOT NULL
+            LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            break
+        
+        marks_rows, arrears_rows, subjects_rows, notes_rows, qa_rows = [], [], [], [], []
+        for row in rows:
+            student_id = row[0]
+            for semester, subjects_data in load_json(row[1], {}).items():
+                if isinstance(subjects_data, dict):
+                    for subject, mark in subjects_data.items():
+                        marks_rows.append((student_id, str(semester), subject, str(mark)))
+                else:
+                    # Legacy format stored one value per semester
+                    marks_rows.append((student_id, str(semester), 'Overall', str(subjects_data)))
+            for arrear in load_json(row[2], []):
+                if isinstance(arrear, dict) and arrear.get('subject'):
+                    arrears_rows.append((student_id, arrear['subject'], arrear.get('status', '')))
+            for position, subject in enumerate(load_json(row[3], [])):
+                subjects_rows.append((student_id, position, str(subject)))
+            for subject, link in load_json(row[4], {}).items():
+                notes_rows.append((student_id, subject, str(link)))
+            for position, qa in enumerate(load_json(row[5], [])):
+                if isinstance(qa, dict) and 'question' in qa and 'answer' in qa:
+                    qa_rows.append((student_id, position, str(qa['question']), str(qa['answer'])))
+        
+        conn.executemany('INSERT OR REPLACE INTO marks (student_id, semester, subject, value) VALUES (?, ?, ?, ?)', marks_rows)
+        conn.executemany('INSERT OR REPLACE INTO arrears (student_id, subject, status) VALUES (?, ?, ?)', arrears_rows)
+        conn.executemany('INSERT OR REPLACE INTO subjects (student_id, position, subject) VALUES (?, ?, ?)', subjects_rows)
+        conn.executemany('INSERT OR REPLACE INTO subject_notes (student_id, subject, link) VALUES (?, ?, ?)', notes_rows)
+        conn.executemany('INSERT OR REPLACE INTO chatbot_qa (student_id, position, question, answer) VALUES (?, ?, ?, ?)', qa_rows)
+        conn.executemany('''
+            UPDATE users SET semester_marks = NULL, arrears = NULL, subjects = NULL,
+            subject_notes = NULL, chatbot_questions = NULL WHERE id = ?
+        ''', [(row[0],) for row in rows])
+
+# Metrics
+class Metrics:
+    """Thread-safe counters and histograms rendered in Prometheus text format
+
+    Values are per worker process; Prometheus sums them across scrapes of
+    each worker.
+    """
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        """Register the TYPE and HELP lines for a metric"""
+        self._help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter(self, name, **labels):
+        """Return the current value of a counter"""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (not cumulative), then sum and count
+                histogram = self._histograms[key] = [0] * len(self.BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self, gauges=()):
+        """Return all metrics plus extra (name, value, labels) gauges as exposition text"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+        samples = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {value}')
+        for (name, labels), histogram in sorted(histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, histogram):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", repr(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {histogram[-1]}')
+            lines.append(f'{name}_sum{format_labels(labels)} {histogram[-2]}')
+            lines.append(f'{name}_count{format_labels(labels)} {histogram[-1]}')
+        for name, value, labels in gauges:
+            samples.setdefault(name, []).append(f'{name}{format_labels(tuple(sorted(labels.items())))} {float(value)}')
+        output = []
+        for name in sorted(samples):
+            kind, text = self._help.get(name, ('gauge', name))
+            output.append(f'# HELP {name} {text}')
+            output.append(f'# TYPE {name} {kind}')
+            output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+def format_labels(labels):
+    """Render ((name, value), ...) as a Prometheus label set"""
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), " ")}"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+metrics = Metrics()
+metrics.describe('http_request_duration_seconds', 'histogram', 'Time to produce a response, by endpoint, method and status')
+metrics.describe('db_query_duration_seconds', 'histogram', 'SQLite statement execution time, by statement type')
+metrics.describe('json_parse_duration_seconds', 'histogram', 'Time spent parsing stored JSON values')
+metrics.describe('template_render_duration_seconds', 'histogram', 'Jinja template render time, by template')
+metrics.describe('chatbot_intent_total', 'counter', 'Chatbot answers by bot and matched intent (none = miss)')
+metrics.describe('chatbot_cache_total', 'counter', 'Public chatbot answer cache lookups by result')
+metrics.describe('dashboard_row_cache_total', 'counter', 'Rendered dashboard row cache lookups by result')
+metrics.describe('user_lazy_column_total', 'counter', 'Users columns fetched after the row was loaded, by column')
+metrics.describe('app_exceptions_total', 'counter', 'Unhandled exceptions by type')
+
+def statement_type(sql):
+    """First keyword of a SQL statement, used as a low-cardinality label"""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else 'EMPTY'
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records statement timings in ``metrics``"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe('db_query_duration_seconds', time.perf_counter() - started, statement=statement_type(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe('db_query_duration_seconds', time.perf_counter() - started, statement=statement_type(sql))
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that is reused instead of closed
+
+    Handlers still call ``conn.close()`` when they are done; for a pooled
+    connection that only rolls back anything left uncommitted, which is
+    what closing a plain connection would have done. Helpers that may run
+    in the middle of a handler never close it, so they cannot discard the
+    handler's uncommitted writes. Statements run through it are timed.
+    """
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+class ConnectionPool:
+    """One long-lived SQLite connection per worker thread"""
+
+    def __init__(self, database, busy_timeout=5000, mmap_size=64 * 1024 * 1024):
+        self.database = database
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout / 1000, factory=PooledConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA foreign_keys = ON')
+        return conn
+
+    def acquire(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not cross a fork, so a child process opens its own
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def release(self, conn):
+        """Hand a connection back, discarding any uncommitted work"""
+        conn.close()
+
+    def discard(self):
+        """Close this thread's connection for good"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.really_close()
+        self._local.conn = None
+
+# Connection pool for app.config['DATABASE']; built by init_app
+db_pool = None
+
+def get_db_connection():
+    """Get the pooled database connection for the current request"""
+    if not has_app_context():
+        return db_pool.acquire()
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def cache_photos_forever(response):
+    """Mark content-addressed photos immutable"""
+    if (request.endpoint == 'static' and response.status_code == 200
+            and (request.view_args or {}).get('filename', '').startswith(PHOTO_STATIC_PREFIX)):
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['PHOTO_MAX_AGE']
+        response.cache_control.immutable = True
+        response.expires = int(time.time() + app.config['PHOTO_MAX_AGE'])
+    return response
+
+@app.after_request
+def record_request_time(response):
+    """Record request latency (for streams, the time to the first byte)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe(
+            'http_request_duration_seconds', time.perf_counter() - started,
+            endpoint=request.endpoint or 'unmatched', method=request.method, status=response.status_code
+        )
+    return response
+
+def start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+def record_template_time(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        metrics.observe('template_render_duration_seconds', time.perf_counter() - started, template=template.name)
+
+before_render_template.connect(start_template_timer, app)
+template_rendered.connect(record_template_time, app)
+
+@app.url_defaults
+def static_url_version(endpoint, values):
+    """Add the file's mtime to static URLs so long cache lifetimes are safe"""
+    if endpoint != 'static' or 'v' in values or 'filename' not in values:
+        return
+    if values['filename'].startswith(PHOTO_STATIC_PREFIX):
+        # Named by content hash already
+        return
+    try:
+        values['v'] = int(os.stat(os.path.join(app.static_folder, values['filename'])).st_mtime)
+    except OSError:
+        pass
+
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+# Student photos
+PHOTO_STATIC_PREFIX = 'images/photos/'
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif')
+)
+
+def sniff_image_type(head):
+    """Return the file extension for an image's leading bytes, or None"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+def store_photo(upload):
+    """Stream an uploaded photo into content-addressed storage and return its static path
+
+    The file is named by the SHA-256 of its bytes, so identical uploads share
+    one file. Raises ValueError if the content is not a PNG, JPEG or GIF.
+    """
+    folder = os.path.join(app.static_folder, PHOTO_STATIC_PREFIX)
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    head = b''
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = upload.stream.read(64 * 1024)
+                if not chunk:
+                    break
+                if len(head) < 16:
+                    head = (head + chunk)[:16]
+                digest.update(chunk)
+                out.write(chunk)
+        extension = sniff_image_type(head)
+        if extension is None:
+            raise ValueError('Uploaded file is not a PNG, JPG or GIF image')
+        filename = f'{digest.hexdigest()}.{extension}'
+        final_path = os.path.join(folder, filename)
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, final_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return PHOTO_STATIC_PREFIX + filename
+
+def photo_variant_path(photo_path, variant):
+    return f"{photo_path.rsplit('.', 1)[0]}.{variant}.webp"
+
+def generate_photo_variants(photo_path):
+    """Write the resized WebP variants of a stored photo (runs on photo_worker)"""
+    if Image is None:
+        return
+    source = os.path.join(app.static_folder, photo_path)
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for variant, size in app.config['PHOTO_VARIANT_SIZES'].items():
+                target = os.path.join(app.static_folder, photo_variant_path(photo_path, variant))
+                if os.path.exists(target):
+                    continue
+                resized = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                resized.save(target + '.tmp', 'WEBP', quality=80, method=4)
+                os.replace(target + '.tmp', target)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        app.logger.warning('Error creating photo variants for %s: %s', photo_path, e)
+        return
+    # Bump the owners' version so cached dashboard rows pick up the variants
+    conn = get_db_connection()
+    try:
+        conn.execute('UPDATE users SET photo_path = photo_path WHERE photo_path = ?', (photo_path,))
+        conn.commit()
+    finally:
+        conn.close()
+
+photo_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='photo-variants')
+
+def queue_photo_variants(photo_path):
+    """Resize a newly stored photo in the background"""
+    if photo_path and photo_path.startswith(PHOTO_STATIC_PREFIX) and Image is not None:
+        photo_worker.submit(generate_photo_variants, photo_path)
+
+def delete_photo_if_unused(conn, photo_path):
+    """Remove a photo and its variants once no user refers to it"""
+    if not photo_path:
+        return
+    in_use = conn.execute('SELECT 1 FROM users WHERE photo_path = ? LIMIT 1', (photo_path,)).fetchone()
+    if in_use:
+        return
+    paths = [photo_path]
+    if photo_path.startswith(PHOTO_STATIC_PREFIX):
+        paths.extend(photo_variant_path(photo_path, variant) for variant in app.config['PHOTO_VARIANT_SIZES'])
+    for path in paths:
+        full_path = os.path.join(app.static_folder, path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+
+@app.template_global()
+def photo_url(photo_path, variant=None):
+    """URL of a stored photo, preferring its resized variant once it has been generated"""
+    if variant and photo_path.startswith(PHOTO_STATIC_PREFIX):
+        variant_path = photo_variant_path(photo_path, variant)
+        if os.path.exists(os.path.join(app.static_folder, variant_path)):
+            return url_for('static', filename=variant_path)
+    return url_for('static', filename=photo_path)
+
+def is_valid_email(email):
+    """Validate email format"""
+    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return re.match(pattern, email) is not None
+
+def is_valid_phone(phone):
+    """Validate phone number format (10 digits)"""
+    pattern = r'^\d{10}$'
+    return re.match(pattern, phone) is not None
+
+def load_json(value, default):
+    """Parse a JSON TEXT column, falling back to default on empty or bad data"""
+    if not value:
+        return default
+    started = time.perf_counter()
+    try:
+        return json.loads(value)
+    except (ValueError, TypeError):
+        return default
+    finally:
+        metrics.observe('json_parse_duration_seconds', time.perf_counter() - started)
+
+# Student academic records
+_users_fts_available = None
+
+def is_student(conn, student_id):
+    """Check that student_id refers to an existing student"""
+    return conn.execute(
+        'SELECT 1 FROM users WHERE id = ? AND role = ?', (student_id, 'student')
+    ).fetchone() is not None
+
+def fetch_marks(conn, student_id):
+    """Return marks as {semester: {subject: marks}}"""
+    marks = {}
+    for row in conn.execute(
+        'SELECT semester, subject, value FROM marks WHERE student_id = ? ORDER BY semester, rowid',
+        (student_id,)
+    ):
+        marks.setdefault(row['semester'], {})[row['subject']] = row['value']
+    return marks
+
+def fetch_arrears(conn, student_id):
+    """Return arrears as a list of {'subject', 'status'} dicts"""
+    return [
+        {'subject': row['subject'], 'status': row['status']}
+        for row in conn.execute(
+            'SELECT subject, status FROM arrears WHERE student_id = ? ORDER BY rowid', (student_id,)
+        )
+    ]
+
+def fetch_subjects(conn, student_id):
+    """Return the student's subjects in the order the teacher entered them"""
+    return [
+        row['subject']
+        for row in conn.execute(
+            'SELECT subject FROM subjects WHERE student_id = ? ORDER BY position', (student_id,)
+        )
+    ]
+
+def fetch_subject_notes(conn, student_id):
+    """Return subject notes as {subject: link}"""
+    return {
+        row['subject']: row['link']
+        for row in conn.execute(
+            'SELECT subject, link FROM subject_notes WHERE student_id = ? ORDER BY rowid', (student_id,)
+        )
+    }
+
+def fetch_chatbot_questions(conn, student_id):
+    """Return custom chatbot Q&A as a list of {'question', 'answer'} dicts"""
+    return [
+        {'question': row['question'], 'answer': row['answer']}
+        for row in conn.execute(
+            'SELECT question, answer FROM chatbot_qa WHERE student_id = ? ORDER BY position', (student_id,)
+        )
+    ]
+
+def fetch_subjects_for(conn, student_ids):
+    """Return {student_id: [subjects]} for the given students"""
+    subjects_by_student = {}
+    if not student_ids:
+        return subjects_by_student
+    placeholders = ','.join('?' * len(student_ids))
+    for row in conn.execute(
+        f'SELECT student_id, subject FROM subjects WHERE student_id IN ({placeholders}) ORDER BY student_id, position',
+        list(student_ids)
+    ):
+        subjects_by_student.setdefault(row['student_id'], []).append(row['subject'])
+    return subjects_by_student
+
+def parse_page_cursor(cursor):
+    """Split a 'created_at|id' dashboard cursor, or return None if malformed"""
+    if not cursor or '|' not in cursor:
+        return None
+    created_at, _, student_id = cursor.rpartition('|')
+    try:
+        return created_at, int(student_id)
+    except ValueError:
+        return None
+
+def fetch_students_page(conn, search='', after=None, before=None, page_size=50):
+    """Fetch one keyset-paginated page of students, newest first
+
+    Returns (students, next_cursor, prev_cursor). Pages are addressed by
+    the (created_at, id) of their last/first row, so each page is a single
+    range scan on idx_users_role_created however deep the teacher pages.
+    """
+    global _users_fts_available
+    where = ['role = ?']
+    params = ['student']
+    
+    terms = re.findall(r'\w+', search.lower())
+    if terms:
+        if _users_fts_available is None:
+            _users_fts_available = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+            ).fetchone() is not None
+        if _users_fts_available:
+            where.append('id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)')
+            params.append(' '.join(f'"{term}"*' for term in terms))
+        else:
+            for term in terms:
+                where.append('(name LIKE ? OR roll_number LIKE ? OR department LIKE ?)')
+                params.extend([f'%{term}%'] * 3)
+    
+    after = parse_page_cursor(after)
+    before = parse_page_cursor(before) if after is None else None
+    if after:
+        where.append('(created_at, id) < (?, ?)')
+        params.extend(after)
+        order = 'created_at DESC, id DESC'
+    elif before:
+        where.append('(created_at, id) > (?, ?)')
+        params.extend(before)
+        order = 'created_at ASC, id ASC'
+    else:
+        order = 'created_at DESC, id DESC'
+    
+    rows = select_users(
+        conn, 'student_record', " AND ".join(where), params + [page_size + 1], f' ORDER BY {order} LIMIT ?'
+    )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+    
+    def cursor_of(row):
+        return f"{row['created_at']}|{row['id']}"
+    
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or before:
+            next_cursor = cursor_of(rows[-1])
+        if after or (before and has_more):
+            prev_cursor = cursor_of(rows[0])
+    return rows, next_cursor, prev_cursor
+
+STUDENT_RECORD_FIELDS = (
+    'id', 'email_phone', 'name', 'roll_number', 'department', 'age',
+    'blood_group', 'photo_path', 'notes_link', 'created_at', 'version', 'updated_at'
+)
+
+def student_record(row, subjects):
+    """Build the dashboard/JSON representation of a student row"""
+    record = {field: row[field] for field in STUDENT_RECORD_FIELDS}
+    record['subjects'] = subjects
+    record['parent_details'] = row.json('parent_details', {})
+    return record
+
+# User rows with projected columns
+USER_COLUMNS = (
+    'id', 'email_phone', 'password', 'role', 'name', 'roll_number', 'department',
+    'photo_path', 'semester_marks', 'arrears', 'notes_link', 'subject_notes', 'created_at',
+    'age', 'blood_group', 'parent_details', 'chatbot_questions', 'subjects', 'version', 'updated_at'
+)
+
+# Columns each route reads up front; the legacy JSON blob columns (marks
+# history, Q&A lists) are left out, and parent details only where shown
+USER_PROJECTIONS = {
+    'login': ('id', 'email_phone', 'password', 'role', 'name'),
+    'profile': (
+        'id', 'email_phone', 'role', 'name', 'roll_number', 'department', 'photo_path',
+        'age', 'blood_group', 'notes_link', 'created_at', 'parent_details'
+    ),
+    'student_record': STUDENT_RECORD_FIELDS + ('parent_details',)
+}
+
+class LazyUser(Mapping):
+    """A users row holding only the projected columns
+
+    Any other column is fetched the first time it is read, and ``json()``
+    parses a JSON column at most once per row.
+    """
+
+    def __init__(self, row):
+        self._values = dict(zip(row.keys(), row))
+        self._parsed = {}
+
+    def __getitem__(self, column):
+        if column not in self._values:
+            if column not in USER_COLUMNS:
+                raise KeyError(column)
+            self._values[column] = fetch_user_column(self._values['id'], column)
+            metrics.inc('user_lazy_column_total', column=column)
+        return self._values[column]
+
+    def __contains__(self, column):
+        return column in USER_COLUMNS
+
+    def __iter__(self):
+        return iter(USER_COLUMNS)
+
+    def __len__(self):
+        return len(USER_COLUMNS)
+
+    def json(self, column, default):
+        """Return a JSON column parsed, fetching it first if it was not projected"""
+        if column not in self._parsed:
+            self._parsed[column] = load_json(self[column], default)
+        return self._parsed[column]
+
+def fetch_user_column(user_id, column):
+    """Read one column of one user; column must come from USER_COLUMNS"""
+    row = get_db_connection().execute(f'SELECT {column} FROM users WHERE id = ?', (user_id,)).fetchone()
+    return row[0] if row else None
+
+def select_users(conn, projection, where, params=(), suffix=''):
+    """Fetch the users matching where with the named projection, as LazyUser rows"""
+    columns = USER_PROJECTIONS[projection]
+    rows = conn.execute(f'SELECT {", ".join(columns)} FROM users WHERE {where}{suffix}', params).fetchall()
+    return [LazyUser(row) for row in rows]
+
+def select_user(conn, projection, where, params=()):
+    """Fetch the first user matching where, or None"""
+    users = select_users(conn, projection, where, params, ' LIMIT 1')
+    return users[0] if users else None
+
+def student_row_response(conn, student_id, message, changes=None):
+    """JSON response carrying the updated student and their rendered table row
+
+    The teacher dashboard swaps in ``html`` for the student's existing row
+    instead of reloading the whole page. ``changes`` describes edits to
+    records that are not shown in the row (marks, arrears, notes).
+    """
+    row = select_user(conn, 'student_record', 'id = ? AND role = ?', (student_id, 'student'))
+    if row is None:
+        return jsonify({'success': True, 'message': message})
+    student = student_record(row, fetch_subjects(conn, student_id))
+    payload = {
+        'success': True,
+        'message': message,
+        'student': student,
+        'html': render_student_row(student)
+    }
+    if changes:
+        payload['changes'] = changes
+    return jsonify(payload)
+
+def render_student_row(student):
+    """Render a student's dashboard row, reusing the cached HTML while the row is unchanged"""
+    # users.version changes on every write to the student or their records
+    key = (student['id'], student['version'])
+    row_html = student_rows.get(key)
+    metrics.inc('dashboard_row_cache_total', result='miss' if row_html is None else 'hit')
+    if row_html is None:
+        row_html = Markup(render_template('_student_row.html', student=student))
+        student_rows.put(key, row_html)
+    return row_html
+
+def replace_subjects(conn, student_id, subjects):
+    """Replace the student's subject list"""
+    conn.execute('DELETE FROM subjects WHERE student_id = ?', (student_id,))
+    conn.executemany(
+        'INSERT INTO subjects (student_id, position, subject) VALUES (?, ?, ?)',
+        [(student_id, position, subject) for position, subject in enumerate(subjects)]
+    )
+
+def replace_chatbot_questions(conn, student_id, questions):
+    """Replace the student's custom chatbot Q&A list and its term index"""
+    conn.execute('DELETE FROM chatbot_qa WHERE student_id = ?', (student_id,))
+    conn.execute('DELETE FROM chatbot_qa_terms WHERE student_id = ?', (student_id,))
+    conn.executemany(
+        'INSERT INTO chatbot_qa (student_id, position, question, answer) VALUES (?, ?, ?, ?)',
+        [(student_id, position, str(qa['question']), str(qa['answer'])) for position, qa in enumerate(questions)]
+    )
+    conn.executemany(
+        'INSERT OR IGNORE INTO chatbot_qa_terms (student_id, position, term) VALUES (?, ?, ?)',
+        [
+            (student_id, position, term)
+            for position, qa in enumerate(questions)
+            for term in tokenize_text(str(qa['question']))
+        ]
+    )
+
+# Custom Q&A matching
+QA_STOPWORDS = frozenset(
+    'a an the is are am was were be been i my me mine you your to of in on at for do does did '
+    'please can could would tell me about and or it its this that what whats which'.split()
+)
+
+def tokenize_text(text):
+    """Normalize text into a set of searchable terms
+
+    Lowercases, drops stopwords and folds simple plurals so that
+    'What are the exam dates?' and 'exam date' share the same terms.
+    """
+    return set(iter_terms(text))
+
+def iter_terms(text):
+    """Yield the normalized terms of text in order, repeats included"""
+    for word in re.findall(r'\w+', text.lower()):
+        if word in QA_STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        yield word
+
+class QAIndex:
+    """Inverted index over custom Q&A questions
+
+    ``postings`` maps a term to the entries whose question contains it, so a
+    lookup only touches entries sharing a term with the message. An entry
+    matches when all of its terms appear in the message, or when the
+    overlap (shared terms over all distinct terms) reaches ``threshold``.
+    """
+
+    def __init__(self, entries, threshold=0.5):
+        # entries: iterable of (key, answer, terms)
+        self.answers = {}
+        self.term_counts = {}
+        self.postings = {}
+        self.threshold = threshold
+        for key, answer, terms in entries:
+            self.answers[key] = answer
+            self.term_counts[key] = len(terms)
+            for term in terms:
+                self.postings.setdefault(term, []).append(key)
+
+    def __len__(self):
+        return len(self.answers)
+
+    def search(self, message_terms, limit=3):
+        """Return up to limit (score, key, answer) matches, best first"""
+        if not message_terms or not self.postings:
+            return []
+        hits = {}
+        for term in message_terms:
+            for key in self.postings.get(term, ()):
+                hits[key] = hits.get(key, 0) + 1
+        ranked = []
+        for key, matched in hits.items():
+            coverage = matched / self.term_counts[key]
+            overlap = matched / (self.term_counts[key] + len(message_terms) - matched)
+            if coverage == 1 or overlap >= self.threshold:
+                ranked.append((coverage + overlap, key))
+        # Highest score first; earlier entries win ties
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, key, self.answers[key]) for score, key in ranked[:limit]]
+
+def load_qa_index(conn, student_id):
+    """Build a student's Q&A index from the saved term table"""
+    terms = {}
+    for row in conn.execute(
+        'SELECT position, term FROM chatbot_qa_terms WHERE student_id = ?', (student_id,)
+    ):
+        terms.setdefault(row['position'], set()).add(row['term'])
+    return QAIndex(
+        (row['position'], row['answer'], terms.get(row['position'], set()))
+        for row in conn.execute(
+            'SELECT position, answer FROM chatbot_qa WHERE student_id = ? ORDER BY position', (student_id,)
+        )
+    )
+
+def normalize_department(department):
+    """Question bank key for a department name: ' CS  Dept' and 'cs dept' are the same bank"""
+    return ' '.join((department or '').split()).lower()
+
+def unsearchable_question(questions):
+    """Return the first question with no searchable terms (only stopwords), or None"""
+    for qa in questions:
+        if not tokenize_text(str(qa['question'])):
+            return str(qa['question'])
+    return None
+
+def fetch_question_bank(conn, department=None):
+    """Return question bank entries for one department ('' for the shared bank)"""
+    return [
+        {'question': row['question'], 'answer': row['answer']}
+        for row in conn.execute(
+            'SELECT question, answer FROM question_bank WHERE IFNULL(department, \'\') = ? ORDER BY id',
+            (normalize_department(department),)
+        )
+    ]
+
+def replace_question_bank(conn, department, questions):
+    """Replace one department's question bank ('' for the shared bank) and its term index"""
+    department = normalize_department(department)
+    conn.execute("DELETE FROM question_bank WHERE IFNULL(department, '') = ?", (department,))
+    for qa in questions:
+        cursor = conn.execute(
+            'INSERT INTO question_bank (department, question, answer) VALUES (?, ?, ?)',
+            (department or None, str(qa['question']), str(qa['answer']))
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO question_bank_terms (bank_id, term) VALUES (?, ?)',
+            [(cursor.lastrowid, term) for term in tokenize_text(str(qa['question']))]
+        )
+
+
+# Bulk imports
+MARKS_IMPORT_FIELDS = ('roll_number', 'semester', 'subject', 'marks')
+ARREARS_IMPORT_FIELDS = ('roll_number', 'subject', 'status')
+
+def iter_import_rows(upload):
+    """Yield (row_number, dict) pairs from an uploaded CSV, JSON or JSON Lines file
+
+    CSV and JSON Lines are decoded line by line straight off the upload
+    stream; a JSON array has to be parsed whole.
+    """
+    filename = (upload.filename or '').lower()
+    lines = codecs.iterdecode(upload.stream, 'utf-8-sig')
+    if filename.endswith('.jsonl'):
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                yield number, json.loads(line)
+    elif filename.endswith('.json'):
+        data = json.loads(''.join(lines))
+        items = data.get('rows') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            raise ValueError('JSON upload must be a list of rows or an object with a "rows" list')
+        for number, item in enumerate(items, 1):
+            yield number, item
+    else:
+        reader = csv.reader(lines)
+        header = [h.strip().lower().replace(' ', '_') for h in next(reader, [])]
+        for number, values in enumerate(reader, 2):
+            if any(v.strip() for v in values):
+                yield number, dict(zip(header, values))
+
+def resolve_roll_numbers(conn, roll_numbers):
+    """Map roll numbers to lists of student ids with a single query"""
+    ids = {}
+    for row in conn.execute(
+        'SELECT id, roll_number FROM users WHERE role = ? AND roll_number IN (SELECT value FROM json_each(?))',
+        ('student', json.dumps(sorted(roll_numbers)))
+    ):
+        ids.setdefault(row['roll_number'], []).append(row['id'])
+    return ids
+
+def import_value(item, field):
+    """Text of one field of an import row; only a missing or null value counts as empty"""
+    return '' if item.get(field) is None else str(item[field]).strip()
+
+def bulk_import(rows, fields, required, build_params, sql):
+    """Validate rows, resolve roll numbers and apply them in one transaction
+
+    ``build_params(student_id, row)`` turns a validated row into the
+    parameters for ``sql``. Returns a JSON-ready summary with per-row errors.
+    """
+    errors = []
+    pending = []
+    try:
+        for number, item in rows:
+            if not isinstance(item, dict):
+                errors.append({'row': number, 'error': 'Row must be an object'})
+                continue
+            row = {field: import_value(item, field) for field in fields}
+            missing = [field for field in required if not row[field]]
+            if missing:
+                errors.append({'row': number, 'error': f'Missing {", ".join(missing)}'})
+                continue
+            pending.append((number, row))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return {'error': f'Could not parse upload: {str(e)}'}
+    
+    conn = get_db_connection()
+    student_ids = resolve_roll_numbers(conn, {row['roll_number'] for _, row in pending})
+    params = []
+    touched = set()
+    for number, row in pending:
+        matches = student_ids.get(row['roll_number'], [])
+        if len(matches) != 1:
+            reason = 'Unknown roll number' if not matches else 'Roll number matches more than one student'
+            errors.append({'row': number, 'error': f"{reason}: {row['roll_number']}"})
+            continue
+        params.append(build_params(matches[0], row))
+        touched.add(matches[0])
+    
+    with conn:
+        stamp_change_versions(conn, sql, params, touched)
+    
+    for student_id in touched:
+        student_profiles.invalidate(student_id)
+    
+    errors.sort(key=lambda e: e['row'])
+    max_errors = app.config['IMPORT_MAX_ERRORS']
+    return {
+        'success': True,
+        'imported': len(params),
+        'students': len(touched),
+        'failed': len(errors),
+        'errors': errors[:max_errors]
+    }
+
+STUDENT_IMPORT_FIELDS = ('email_phone', 'password', 'name', 'roll_number', 'department')
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+def pool_workers(configured):
+    """Size of a per-process pool: the configured value, or this process's share of the CPUs"""
+    if configured:
+        return configured
+    return max(1, (os.cpu_count() or 2) // max(1, app.config['WORKER_PROCESSES']))
+
+def start_process_pool(workers):
+    """Start a process pool whose children are spawned rather than forked
+
+    Forking a threaded server worker copies locks that other threads may
+    be holding at that moment, which can deadlock the child.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def get_hash_pool():
+    """Return the shared process pool used for CPU-bound password hashing"""
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                _hash_pool = start_process_pool(pool_workers(app.config['HASH_WORKERS']))
+    return _hash_pool
+
+def discard_hash_pool(pool):
+    """Forget a broken hashing pool so get_hash_pool starts a new one"""
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is pool:
+            _hash_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def hash_password(password):
+    """Hash a password with the configured method"""
+    return generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
+
+def hash_passwords(passwords):
+    """Hash a batch of passwords across all cores, keeping input order"""
+    if len(passwords) < 2:
+        return [hash_password(p) for p in passwords]
+    workers = pool_workers(app.config['HASH_WORKERS'])
+    chunksize = max(1, len(passwords) // (workers * 4))
+    hasher = partial(generate_password_hash, method=app.config['PASSWORD_HASH_METHOD'])
+    pool = get_hash_pool()
+    try:
+        return list(pool.map(hasher, passwords, chunksize=chunksize))
+    except OSError:
+        # Process pools are unavailable in some sandboxes; hash inline instead
+        return [hash_password(p) for p in passwords]
+    except BrokenProcessPool:
+        # A child died; the next import starts a fresh pool, this one hashes inline
+        discard_hash_pool(pool)
+        return [hash_password(p) for p in passwords]
+
+_current_hash_prefix = {}
+
+def needs_rehash(pwhash):
+    """Check whether a stored hash was made with outdated method or parameters"""
+    method = app.config['PASSWORD_HASH_METHOD']
+    if method not in _current_hash_prefix:
+        # e.g. 'scrypt' expands to 'scrypt:32768:8:1' in the stored hash
+        _current_hash_prefix[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return pwhash.split('$', 1)[0] != _current_hash_prefix[method]
+
+class LoginBusy(Exception):
+    """Raised when too many password verifications are already queued"""
+
+class PasswordVerifier:
+    """Bounded process pool for login password checks
+
+    At most ``max_pending`` verifications may be queued or running; beyond
+    that, new logins are shed immediately instead of piling up behind a
+    burst. Counters are kept for monitoring queue pressure.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self.counters = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'pool_failures': 0,
+            'rehashed': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'seconds_total': 0.0
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+            if name == 'in_flight':
+                self.counters['max_in_flight'] = max(self.counters['max_in_flight'], self.counters['in_flight'])
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = start_process_pool(pool_workers(self.workers))
+        return self._pool
+
+    def _pool_broken(self, pool):
+        """Drop a pool whose child process died, so the next call starts a fresh one"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._count('pool_failures')
+        raise LoginBusy()
+
+    def _run(self, fn, *args):
+        """Run fn(*args) in the pool, raising LoginBusy under overload or on timeout"""
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise LoginBusy()
+        self._count('submitted')
+        self._count('in_flight')
+        started = time.perf_counter()
+        try:
+            pool = self._get_pool()
+            try:
+                future = pool.submit(fn, *args)
+            except OSError:
+                result = fn(*args)
+            except BrokenProcessPool:
+                self._pool_broken(pool)
+            else:
+                try:
+                    result = future.result(timeout=self.timeout)
+                except FutureTimeoutError:
+                    future.cancel()
+                    self._count('timed_out')
+                    raise LoginBusy()
+                except BrokenProcessPool:
+                    self._pool_broken(pool)
+            self._count('completed')
+            return result
+        finally:
+            self._count('in_flight', -1)
+            self._count('seconds_total', time.perf_counter() - started)
+            self._slots.release()
+
+    def verify(self, pwhash, password):
+        """Check password against pwhash in the pool"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def hash(self, password, method):
+        """Hash password with method in the pool"""
+        return self._run(generate_password_hash, password, method)
+
+    def count_rehash(self):
+        """Record a stored hash upgraded after a successful login"""
+        self._count('rehashed')
+
+    def stats(self):
+        """Snapshot of the verifier counters"""
+        with self._lock:
+            stats = dict(self.counters)
+        stats['max_pending'] = self.max_pending
+        stats['workers'] = pool_workers(self.workers)
+        return stats
+
+# Built by init_app
+login_verifier = None
+
+def verify_password(pwhash, password):
+    """Verify a login password, offloading to the pool when enabled"""
+    if app.config['LOGIN_OFFLOAD_HASHING']:
+        return login_verifier.verify(pwhash, password)
+    return check_password_hash(pwhash, password)
+
+def rehash_password(user_id, password):
+    """Store a fresh hash for a user who just logged in with an outdated one"""
+    try:
+        if app.config['LOGIN_OFFLOAD_HASHING']:
+            pwhash = login_verifier.hash(password, app.config['PASSWORD_HASH_METHOD'])
+        else:
+            pwhash = hash_password(password)
+    except LoginBusy:
+        # The login itself succeeded; the hash is upgraded on a quieter login
+        return
+    conn = get_db_connection()
+    conn.execute('UPDATE users SET password = ? WHERE id = ?', (pwhash, user_id))
+    conn.commit()
+    login_verifier.count_rehash()
+
+def import_rows_from_request():
+    """Return row pairs from an uploaded file or a JSON body with a 'rows' list"""
+    upload = request.files.get('file')
+    if upload and upload.filename:
+        return iter_import_rows(upload)
+    data = request.get_json(silent=True) or {}
+    rows = data.get('rows') if isinstance(data, dict) else None
+    if isinstance(rows, list):
+        return enumerate(rows, 1)
+    return None
+
+# Chatbot rate limiting
+class RateLimiter:
+    """Token-bucket rate limiter keyed by client
+
+    Each key refills at ``rate`` tokens per second up to ``burst`` and every
+    request takes one token. Buckets live in an in-process LRU, or in the
+    ``rate_limit_buckets`` table when ``shared`` is set so that every worker
+    process draws from the same bucket.
+    """
+
+    def __init__(self, shared=False, max_keys=50000):
+        self.shared = shared
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared_takes = 0
+        self.counters = {'allowed': 0, 'limited': 0, 'store_errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _take_local(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def _take_shared(self, key, rate, burst, now):
+        # One statement refills and takes a token, so concurrent workers can't race
+        refill = 'MIN(:burst, tokens + (:now - updated) * :rate)'
+        conn = get_db_connection()
+        row = conn.execute(f'''
+            INSERT INTO rate_limit_buckets (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1)
+            ON CONFLICT(key) DO UPDATE SET
+                tokens = CASE WHEN {refill} >= 1 THEN {refill} - 1 ELSE {refill} END,
+                allowed = {refill} >= 1,
+                updated = :now
+            RETURNING allowed, tokens
+        ''', {'key': key, 'rate': rate, 'burst': burst, 'now': now}).fetchone()
+        self._shared_takes += 1
+        if self._shared_takes % 1000 == 0:
+            # Buckets idle this long have refilled completely, so the rows carry no state
+            conn.execute('DELETE FROM rate_limit_buckets WHERE updated < ?', (now - 3600,))
+        conn.commit()
+        return bool(row[0]), row[1]
+
+    def take(self, key, rate, burst):
+        """Take a token for key; return (allowed, seconds until one is available)"""
+        now = time.time()
+        allowed, tokens = True, burst
+        if self.shared:
+            try:
+                allowed, tokens = self._take_shared(key, rate, burst, now)
+            except sqlite3.Error as e:
+                # Fall back to this process's buckets rather than failing the request
+                app.logger.warning('Rate limit store error: %s', e)
+                self._count('store_errors')
+                allowed, tokens = self._take_local(key, rate, burst, now)
+        else:
+            allowed, tokens = self._take_local(key, rate, burst, now)
+        self._count('allowed' if allowed else 'limited')
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def stats(self):
+        """Snapshot of the limiter counters"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['local_buckets'] = len(self._buckets)
+        stats['shared'] = self.shared
+        return stats
+
+# Built by init_app
+chatbot_limiter = None
+
+def rate_limited(view):
+    """Reject the request with 429 when the caller's token bucket is empty
+
+    Logged-in users are limited per account; anonymous visitors per IP.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if app.config['RATE_LIMIT_ENABLED']:
+            if 'user_id' in session:
+                key = f"user:{session['user_id']}"
+                rate, burst = app.config['RATE_LIMIT_SESSION']
+            else:
+                key = f"ip:{request.remote_addr}"
+                rate, burst = app.config['RATE_LIMIT_IP']
+            allowed, retry_after = chatbot_limiter.take(key, rate, burst)
+            if not allowed:
+                response = jsonify({'error': 'Too many messages, please wait a moment and try again'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                return response
+        return view(*args, **kwargs)
+    return wrapper
+
+# Typo-tolerant keyword matching
+# Everyday words that are one edit away from a keyword ('then'/'when',
+# 'yours'/'hours') are never treated as typos, and neither is anything in
+# the CHATBOT_WORDS_FILE dictionary ('apple'/'apply', 'clean'/'clear').
+COMMON_WORDS = frozenset(
+    'this that then than them they there these those here were what whats which while with '
+    'your yours have from will would could should about also some same come came more most '
+    'much many make made just like know need want tell give take took only over very well '
+    'good does done into onto upon time name open when where hours even ever each other '
+    'fair fill free feel fine mine mind kind find sure shall show seem soon'.split()
+)
+
+@functools.lru_cache(maxsize=None)
+def english_words():
+    """Load the dictionary of real words once per process"""
+    path = os.path.join(app.root_path, app.config['CHATBOT_WORDS_FILE'])
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return frozenset(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    except OSError as e:
+        app.logger.warning('Error loading chatbot word list: %s', e)
+        return frozenset()
+
+def is_known_word(word):
+    """Whether word is a real word rather than a possible misspelling"""
+    return word in COMMON_WORDS or word in english_words()
+
+def edit_distance(a, b, max_distance):
+    """Damerau-Levenshtein (optimal string alignment) distance, capped at max_distance + 1"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_row = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before_previous, previous_row = previous_row, row
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before_previous[j - 2] + 1)
+        if min(row) > max_distance:
+            return max_distance + 1
+    return row[-1]
+
+def fuzzy_max_distance(word):
+    """Edits allowed for a word of this length (short words must match exactly)"""
+    if len(word) >= 9:
+        return 2
+    if len(word) >= 4:
+        return 1
+    return 0
+
+def deletion_variants(word, distance):
+    """All strings reachable from word by deleting up to distance characters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+# Public chatbot knowledge (intents are checked in the order they appear in the data file)
+class IntentMatcher:
+    """Keyword intent matcher compiled once at load time
+
+    Exact keywords are found with a single word-boundary regex. Words that
+    miss are corrected SymSpell-style: every single-word keyword's deletion
+    variants are precomputed, so a lookup only generates the deletions of
+    the message word itself and costs the same however large the
+    vocabulary grows.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        # keyword -> (priority, category); the first category to claim a keyword wins
+        self.priority = {}
+        for rank, (category, data) in enumerate(responses.items()):
+            for keyword in data['keywords']:
+                self.priority.setdefault(keyword.lower(), (rank, category))
+        # Longest keywords first so 'good morning' wins over shorter prefixes
+        alternation = '|'.join(
+            re.escape(keyword).replace(r'\ ', r'\s+')
+            for keyword in sorted(self.priority, key=len, reverse=True)
+        )
+        self.pattern = re.compile(r'\b(' + alternation + r')s?\b') if alternation else None
+        # category -> search terms of its keywords, for telling generic questions from specific ones
+        self.keyword_terms = {
+            category: frozenset(tokenize_text(' '.join(data['keywords'])))
+            for category, data in responses.items()
+        }
+        # deletion variant -> keywords it can be derived from
+        self.deletions = {}
+        for keyword in self.priority:
+            distance = fuzzy_max_distance(keyword)
+            if ' ' in keyword or distance == 0 or keyword in COMMON_WORDS:
+                continue
+            for variant in deletion_variants(keyword, distance):
+                self.deletions.setdefault(variant, set()).add(keyword)
+
+    def match(self, message):
+        """Return the highest priority category mentioned in message, or None"""
+        if self.pattern is None:
+            return None
+        best = None
+        for found in self.pattern.finditer(message):
+            hit = self.priority[' '.join(found.group(1).split())]
+            if best is None or hit < best:
+                best = hit
+                if best[0] == 0:
+                    break
+        if best is None:
+            best = self.fuzzy_match(message)
+        return best[1] if best else None
+
+    def fuzzy_match(self, message):
+        """Return (priority, category) for the closest misspelt keyword, or None"""
+        best = None
+        for word in re.findall(r'[a-z]+', message):
+            if is_known_word(word):
+                continue
+            # Plurals are corrected like the exact regex matches them
+            forms = {word, word[:-1]} if word.endswith('s') else {word}
+            for form in forms:
+                distance = fuzzy_max_distance(form)
+                if distance == 0 or is_known_word(form):
+                    continue
+                candidates = set()
+                for variant in deletion_variants(form, distance):
+                    candidates |= self.deletions.get(variant, set())
+                for keyword in candidates:
+                    allowed = min(distance, fuzzy_max_distance(keyword))
+                    found = edit_distance(form, keyword, allowed)
+                    if found <= allowed:
+                        hit = (found,) + self.priority[keyword]
+                        if best is None or hit < best:
+                            best = hit
+        return best[1:] if best else None
+
+# Student chatbot topics; answers are built from the student's own records
+student_intents = IntentMatcher({
+    'marks': {'keywords': ['mark', 'grade', 'score', 'semester', 'cgpa', 'percentage', 'result']},
+    'arrears': {'keywords': ['arrear', 'backlog', 'failed', 'clear', 'clearance']},
+    'subjects': {'keywords': ['subject', 'subjects', 'course', 'courses']}
+})
+
+# Passage retrieval for the public chatbot
+def split_passages(text):
+    """Split a canned response into paragraphs, keeping lead-in lines with what follows"""
+    passages = []
+    lead = ''
+    for paragraph in re.split(r'\n\s*\n', text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # 'COMPUTER SCIENCE DEPARTMENT:' says nothing on its own
+        if paragraph.endswith(':'):
+            lead += paragraph + '\n\n'
+            continue
+        passages.append(lead + paragraph)
+        lead = ''
+    if lead:
+        passages.append(lead.strip())
+    return passages
+
+def about_page_passages(page):
+    """Extract one plain-text passage per section of the about page template"""
+    passages = []
+    for section in re.split(r'<div class="about-section">', page)[1:]:
+        section = section.split('<script', 1)[0]
+        section = re.sub(r'</(h2|h3|p|li)>', '\n', section)
+        section = html.unescape(re.sub(r'<[^>]+>|\{[{%#].*?[%}#]\}', ' ', section))
+        lines = [' '.join(line.split()) for line in section.splitlines()]
+        text = '\n'.join(line for line in lines if line)
+        if text:
+            passages.append(text)
+    return passages
+
+class PassageIndex:
+    """BM25 inverted index over short knowledge passages
+
+    ``postings`` maps a term to (passage, term frequency) pairs and the
+    per-term IDF is computed once at build time, so a query only touches
+    passages that share a term with it.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, passages, postings, lengths):
+        # passages: list of (category, text); postings: term -> [(passage, tf)]
+        self.passages = passages
+        self.postings = postings
+        self.lengths = lengths
+        count = len(passages)
+        average = (sum(lengths) / count) if count else 1
+        self.norms = [self.K1 * (1 - self.B + self.B * length / average) for length in lengths]
+        # category -> id of its first (introductory) passage
+        self.first = {}
+        for passage_id, (category, _) in enumerate(passages):
+            self.first.setdefault(category, passage_id)
+        self.idf = {
+            term: math.log(1 + (count - len(hits) + 0.5) / (len(hits) + 0.5))
+            for term, hits in postings.items()
+        }
+
+    @classmethod
+    def build(cls, passages):
+        """Index a list of (category, text) passages"""
+        postings = {}
+        lengths = []
+        for passage_id, (category, text) in enumerate(passages):
+            counts = {}
+            for term in iter_terms(text):
+                counts[term] = counts.get(term, 0) + 1
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((passage_id, tf))
+        return cls(list(passages), postings, lengths)
+
+    def to_dict(self):
+        return {'passages': self.passages, 'postings': self.postings, 'lengths': self.lengths}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            [tuple(passage) for passage in data['passages']],
+            {term: [tuple(hit) for hit in hits] for term, hits in data['postings'].items()},
+            data['lengths']
+        )
+
+    def search(self, message_terms, categories=None):
+        """Return (score, text) for the best passage, optionally within some categories"""
+        ranked = self.rank(message_terms, categories, limit=1)
+        if not ranked:
+            return None
+        return ranked[0][0], self.passages[ranked[0][1]][1]
+
+    def rank(self, message_terms, categories=None, limit=2):
+        """Return up to limit (score, passage id) pairs, best first"""
+        scores = {}
+        for term in message_terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for passage_id, tf in self.postings[term]:
+                if categories is not None and self.passages[passage_id][0] not in categories:
+                    continue
+                score = idf * tf * (self.K1 + 1) / (tf + self.norms[passage_id])
+                scores[passage_id] = scores.get(passage_id, 0) + score
+        # Highest score first; earlier passages win ties
+        ranked = sorted(scores, key=lambda key: (-scores[key], key))[:limit]
+        return [(scores[passage_id], passage_id) for passage_id in ranked]
+
+def load_passage_index(path, digest, passages):
+    """Return the persisted index for digest, rebuilding and saving it if stale"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('digest') == digest:
+            return PassageIndex.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    index = PassageIndex.build(passages())
+    try:
+        # Write then rename so other workers never read a half-written file
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(index.to_dict(), digest=digest), f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError as e:
+        app.logger.warning('Error saving chatbot passage index: %s', e)
+    return index
+
+# How far the best paragraph must score ahead of the next before it is
+# answered on its own instead of the intent's whole response
+PASSAGE_LEAD = 1.5
+
+IntentSnapshot = namedtuple('IntentSnapshot', ['version', 'mtime', 'default_response', 'matcher', 'passages'])
+
+class IntentKnowledgeBase:
+    """Hot-reloadable chatbot intent table backed by a JSON data file
+
+    Readers only ever dereference ``self.snapshot``, which is replaced
+    wholesale when the file changes, so the read path takes no locks.
+    The about page is indexed alongside the intents and is watched too.
+    """
+
+    def __init__(self, path, check_interval=2.0, about_page=None, index_path=None, min_score=1.5):
+        self.path = path
+        self.min_score = min_score
+        self.about_page = about_page
+        self.index_path = index_path
+        self.check_interval = check_interval
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.snapshot = self._load(self._mtime())
+
+    def _mtime(self):
+        """Modification times of the files the snapshot is built from"""
+        about_mtime = None
+        if self.about_page and os.path.exists(self.about_page):
+            about_mtime = os.stat(self.about_page).st_mtime_ns
+        return (os.stat(self.path).st_mtime_ns, about_mtime)
+
+    def _load(self, mtime):
+        """Parse the data file into a new immutable snapshot"""
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        data = json.loads(raw.decode('utf-8'))
+        responses = {}
+        for category, intent in data['intents'].items():
+            responses[category] = MappingProxyType({
+                'keywords': tuple(intent['keywords']),
+                'response': intent['response']
+            })
+        about = ''
+        if mtime[1] is not None:
+            with open(self.about_page, 'r', encoding='utf-8') as f:
+                about = f.read()
+        
+        def passages():
+            found = [(category, passage)
+                     for category, intent in responses.items()
+                     for passage in split_passages(intent['response'])]
+            found.extend(('about', passage) for passage in about_page_passages(about))
+            return found
+        
+        source_digest = hashlib.sha1(raw + about.encode('utf-8')).hexdigest()
+        if self.index_path:
+            passage_index = load_passage_index(self.index_path, source_digest, passages)
+        else:
+            passage_index = PassageIndex.build(passages())
+        return IntentSnapshot(
+            # Derived from the content, so every worker reports the same version
+            version=source_digest[:12],
+            mtime=mtime,
+            default_response=data.get('default_response', ''),
+            matcher=IntentMatcher(MappingProxyType(responses)),
+            passages=passage_index
+        )
+
+    def answer(self, snapshot, message):
+        """Return (matched intent or None, the intent response or the passage that best answers message)"""
+        category = snapshot.matcher.match(message)
+        message_terms = tokenize_text(message)
+        if category is not None:
+            full_response = snapshot.matcher.responses[category]['response']
+            # Only words beyond the intent's own keywords ask for a particular paragraph
+            if not message_terms - snapshot.matcher.keyword_terms[category]:
+                return category, full_response
+            ranked = snapshot.passages.rank(message_terms, (category,), limit=2)
+            if not ranked or ranked[0][0] < self.min_score:
+                return category, full_response
+            if len(ranked) > 1 and ranked[0][0] < PASSAGE_LEAD * ranked[1][0]:
+                return category, full_response
+            # The introduction matching means a general question about the intent
+            if ranked[0][1] == snapshot.passages.first[category]:
+                return category, full_response
+            return category, snapshot.passages.passages[ranked[0][1]][1]
+        best = snapshot.passages.search(message_terms)
+        if best is None or best[0] < self.min_score:
+            return None, snapshot.default_response
+        return None, best[1]
+
+    def current(self):
+        """Return the latest snapshot, reloading if the data file changed"""
+        snapshot = self.snapshot
+        now = time.monotonic()
+        if now < self._next_check:
+            return snapshot
+        self._next_check = now + self.check_interval
+        # Only one thread reloads; everyone else keeps serving the old snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            return snapshot
+        try:
+            mtime = self._mtime()
+            if mtime != self.snapshot.mtime:
+                self.snapshot = self._load(mtime)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            app.logger.warning('Error reloading chatbot intents: %s', e)
+        finally:
+            self._reload_lock.release()
+        return self.snapshot
+
+# Public chatbot knowledge base; built (and its index loaded) by init_app
+chatbot_kb = None
+
+# In-memory caches
+class TTLCache:
+    """Bounded LRU cache with a per-entry TTL
+
+    Used for student profiles, question banks, rendered rows, chatbot
+    answers and sessions. Writers invalidate entries explicitly; the TTL
+    bounds how stale an entry can get in other worker processes.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Store value for key, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop the cached value for key"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every cached value"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        """Number of stored entries, counting expired ones not yet dropped"""
+        return len(self._entries)
+
+# Parsed student profiles used by the student chatbot; built by init_app
+student_profiles = None
+
+def get_student_profile(student_id):
+    """Return the parsed chatbot profile for a student, using the cache
+
+    A cached profile is only used while the student's ``version`` is
+    unchanged, so edits made through any worker process show up at once.
+    That check is one primary-key read per message even on a cache hit;
+    skipping it would leave other workers' edits hidden for up to
+    PROFILE_CACHE_TTL.
+    """
+    conn = get_db_connection()
+    # The question bank version rides along so the bank cache needs no query of its own
+    user = conn.execute('''
+        SELECT name, department, version, (SELECT value FROM question_bank_version WHERE id = 1) AS bank_version
+        FROM users WHERE id = ?
+    ''', (student_id,)).fetchone()
+    if not user:
+        return None
+    
+    profile = student_profiles.get(student_id)
+    if profile is not None and profile['version'] == user['version']:
+        return dict(profile, bank_version=user['bank_version'])
+    
+    profile = {
+        'version': user['version'],
+        'name': user['name'],
+        'department': user['department'],
+        'marks': fetch_marks(conn, student_id),
+        'arrears': fetch_arrears(conn, student_id),
+        'subjects': fetch_subjects(conn, student_id),
+        'qa_index': load_qa_index(conn, student_id)
+    }
+    student_profiles.put(student_id, profile)
+    return dict(profile, bank_version=user['bank_version'])
+
+# Question bank indexes keyed on (department, question_bank_version); an edit
+# in any worker bumps the version, so stale banks are never served
+question_banks = None
+
+# Rendered dashboard rows keyed on (student id, users.version); an edited row
+# gets a new key, so stale entries are never served and simply age out
+student_rows = None
+
+def get_question_bank_index(department, bank_version):
+    """Return the cached Q&A index of shared and department-specific bank entries"""
+    department = normalize_department(department)
+    index = question_banks.get((department, bank_version))
+    if index is not None:
+        return index
+    conn = get_db_connection()
+    terms = {}
+    for row in conn.execute('''
+        SELECT t.bank_id, t.term FROM question_bank_terms t
+        JOIN question_bank b ON b.id = t.bank_id
+        WHERE b.department IS NULL OR b.department = ?
+    ''', (department,)):
+        terms.setdefault(row['bank_id'], set()).add(row['term'])
+    index = QAIndex(
+        (row['id'], row['answer'], terms.get(row['id'], set()))
+        for row in conn.execute(
+            'SELECT id, answer FROM question_bank WHERE department IS NULL OR department = ? ORDER BY id', (department,)
+        )
+    )
+    question_banks.put((department, bank_version), index)
+    return index
+
+def sse_response(chunks, **done):
+    """Stream text chunks as Server-Sent Events, then a 'done' event carrying done"""
+    def events():
+        for chunk in chunks:
+            yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+    
+    response = app.response_class(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep nginx-style proxies from buffering the whole stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Public chatbot (intent, answer, serialized body) keyed on (kb version, normalized message);
+# a knowledge-base reload changes the version, so old entries just age out
+chatbot_responses = None
+
+def normalize_message(message):
+    """Fold case, runs of whitespace and trailing punctuation out of a chatbot message"""
+    return ' '.join(message.lower().split()).strip(' ?!.')
+
+# Server-side sessions
+class ServerSession(SecureCookieSession):
+    """Session whose data lives in the session store; the cookie only carries ``sid``"""
+
+    def __init__(self, initial=None, sid=None, expires=0.0):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires = expires
+        # dict.get: reading through self.get would mark the session accessed (Vary: Cookie)
+        self.loaded_user_id = dict.get(self, 'user_id')
+
+class SQLiteSessionStore:
+    """Sessions in the ``sessions`` table with an in-process LRU in front
+
+    Revoking drops the session from this process's LRU at once; other
+    worker processes may keep serving it for up to ``cache_ttl`` seconds.
+    """
+
+    def __init__(self, cache_size=10000, cache_ttl=30, sweep_interval=300):
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.sweep_interval = sweep_interval
+        self._sweeper_pid = None
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """Return (serialized data, expires) for a live session, or None"""
+        entry = self.cache.get(sid)
+        if entry is None:
+            conn = get_db_connection()
+            row = conn.execute('SELECT data, expires FROM sessions WHERE id = ?', (sid,)).fetchone()
+            if row is None:
+                return None
+            entry = (row['data'], row['expires'])
+            self.cache.put(sid, entry)
+        if entry[1] < time.time():
+            return None
+        return entry
+
+    def save(self, sid, data, user_id, expires):
+        """Insert or replace a session"""
+        conn = get_db_connection()
+        conn.execute('''
+            INSERT INTO sessions (id, user_id, data, expires) VALUES (?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id, data = excluded.data, expires = excluded.expires
+        ''', (sid, user_id, data, expires))
+        conn.commit()
+        self.cache.put(sid, (data, expires))
+        self._start_sweeper()
+
+    def delete(self, sid):
+        """Remove one session"""
+        conn = get_db_connection()
+        conn.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+        conn.commit()
+        self.cache.invalidate(sid)
+
+    def revoke(self, user_id=None, role=None):
+        """Log out every session of one user, or of every user with a role; return how many ended"""
+        conn = get_db_connection()
+        if user_id is not None:
+            cursor = conn.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+        else:
+            cursor = conn.execute(
+                'DELETE FROM sessions WHERE user_id IN (SELECT id FROM users WHERE role = ?)', (role,)
+            )
+        conn.commit()
+        # Cache keys are session IDs, so drop the lot rather than track them per user
+        self.cache.clear()
+        return cursor.rowcount
+
+    def sweep(self):
+        """Delete expired sessions; return how many were removed"""
+        conn = get_db_connection()
+        cursor = conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+        conn.commit()
+        return cursor.rowcount
+
+    def _start_sweeper(self):
+        # One sweeper per process, started lazily so forked workers get their own
+        if self._sweeper_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+            threading.Thread(target=self._sweep_forever, name='session-sweeper', daemon=True).start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except sqlite3.Error as e:
+                app.logger.warning('Error sweeping sessions: %s', e)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+class ServerSessionInterface(SessionInterface):
+    """Keep session data in a SQLiteSessionStore behind a random session ID cookie"""
 
-# Database initialization
-def init_db():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect('college.db')
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email_phone TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('student', 'teacher')),
-            name TEXT,
-            roll_number TEXT,
-            department TEXT,
-            photo_path TEXT,
-            semester_marks TEXT,
-            arrears TEXT,
-            notes_link TEXT,
-            subject_notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Add new columns if they don't exist (for existing databases)
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN semester_marks TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN arrears TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN notes_link TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN subject_notes TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN age INTEGER')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN blood_group TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN parent_details TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN chatbot_questions TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN subjects TEXT')
-    except:
-        pass
-    
-    conn.commit()
-    conn.close()
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSession
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('college.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    def __init__(self, store):
+        self.store = store
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.store.load(sid)
+            if entry is not None:
+                return self.session_class(self.serializer.loads(entry[0]), sid=sid, expires=entry[1])
+        return self.session_class()
 
-def is_valid_email(email):
-    """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
 
-def is_valid_phone(phone):
-    """Validate phone number format (10 digits)"""
-    pattern = r'^\d{10}$'
-    return re.match(pattern, phone) is not None
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly)
+            return
+
+        if session.sid is not None and session.get('user_id') != session.loaded_user_id:
+            # A new login gets a new ID so a planted session ID is worthless
+            self.store.delete(session.sid)
+            session.sid = None
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        # Unchanged sessions are only rewritten once past half their lifetime
+        if session.sid is not None and not session.modified and session.expires - now > lifetime / 2:
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), session.get('user_id'), now + lifetime)
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session), httponly=httponly,
+            domain=domain, path=path, secure=secure, samesite=samesite
+        )
+
+# Built by init_app, which also installs it when SESSION_BACKEND is 'sqlite'
+session_store = None
 
 # Routes
 @app.route('/')
@@ -129,12 +2359,21 @@ def login():
             return render_template('login.html')
         
         conn = get_db_connection()
-        user = conn.execute(
-            'SELECT * FROM users WHERE email_phone = ?', (email_phone,)
-        ).fetchone()
+        user = select_user(conn, 'login', 'email_phone = ?', (email_phone,))
         conn.close()
         
-        if user and check_password_hash(user['password'], password):
+        try:
+            valid = user is not None and verify_password(user['password'], password)
+        except LoginBusy:
+            flash('The server is busy. Please try again in a few seconds.', 'error')
+            response = app.make_response((render_template('login.html'), 503))
+            response.headers['Retry-After'] = '2'
+            return response
+        
+        if valid:
+            if app.config['PASSWORD_REHASH_ON_LOGIN'] and needs_rehash(user['password']):
+                rehash_password(user['id'], password)
+            
             session['user_id'] = user['id']
             session['role'] = user['role']
             session['name'] = user['name']
@@ -186,22 +2425,21 @@ def register():
             flash('Email/Phone already registered', 'error')
             return render_template('register.html')
         
+        hashed_password = hash_password(password)
+        
         # Handle photo upload (only for students)
         photo_path = None
         if role == 'student' and photo and photo.filename:
-            if allowed_file(photo.filename):
-                filename = secure_filename(f"{email_phone}_{photo.filename}")
-                photo_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                photo.save(photo_path)
-                photo_path = f"images/{filename}"
-            else:
+            try:
+                if not allowed_file(photo.filename):
+                    raise ValueError('Unsupported extension')
+                photo_path = store_photo(photo)
+            except ValueError:
                 conn.close()
                 flash('Invalid file type. Please upload PNG, JPG, or JPEG', 'error')
                 return render_template('register.html')
         
         # Insert user into database
-        hashed_password = generate_password_hash(password)
-        
         try:
             conn.execute('''
                 INSERT INTO users (email_phone, password, role, name, roll_number, department, photo_path)
@@ -209,10 +2447,13 @@ def register():
             ''', (email_phone, hashed_password, role, name, roll_number, department, photo_path))
             conn.commit()
             conn.close()
+            queue_photo_variants(photo_path)
             
             flash('Registration successful! Please login', 'success')
             return redirect(url_for('login'))
         except Exception as e:
+            conn.rollback()
+            delete_photo_if_unused(conn, photo_path)
             conn.close()
             flash(f'Registration failed: {str(e)}', 'error')
     
@@ -226,33 +2467,12 @@ def student_dashboard():
         return redirect(url_for('login'))
     
     conn = get_db_connection()
-    user = conn.execute(
-        'SELECT * FROM users WHERE id = ?', (session['user_id'],)
-    ).fetchone()
+    user = select_user(conn, 'profile', 'id = ?', (session['user_id'],))
+    subject_notes = fetch_subject_notes(conn, session['user_id'])
+    subjects = fetch_subjects(conn, session['user_id'])
     conn.close()
     
-    # Parse subject notes, subjects, and parent details
-    subject_notes = {}
-    subjects = []
-    parent_details = {}
-    
-    if user['subject_notes']:
-        try:
-            subject_notes = json.loads(user['subject_notes']) if user['subject_notes'] else {}
-        except:
-            subject_notes = {}
-    
-    if user['subjects']:
-        try:
-            subjects = json.loads(user['subjects']) if user['subjects'] else []
-        except:
-            subjects = []
-    
-    if user['parent_details']:
-        try:
-            parent_details = json.loads(user['parent_details']) if user['parent_details'] else {}
-        except:
-            parent_details = {}
+    parent_details = user.json('parent_details', {})
     
     return render_template('student_dashboard.html', user=user, subject_notes=subject_notes, subjects=subjects, parent_details=parent_details)
 
@@ -263,38 +2483,32 @@ def teacher_dashboard():
         flash('Access denied', 'error')
         return redirect(url_for('login'))
     
+    search = request.args.get('q', '').strip()
+    
     try:
         conn = get_db_connection()
-        students = conn.execute(
-            'SELECT * FROM users WHERE role = ? ORDER BY created_at DESC', ('student',)
-        ).fetchall()
+        students, next_cursor, prev_cursor = fetch_students_page(
+            conn,
+            search=search,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            page_size=app.config['DASHBOARD_PAGE_SIZE']
+        )
+        subjects_by_student = fetch_subjects_for(conn, [student['id'] for student in students])
         conn.close()
         
-        # Parse JSON fields for each student safely
-        students_data = []
-        for student in students:
-            student_dict = dict(student)
-            # Parse subjects
-            try:
-                if student_dict['subjects']:
-                    student_dict['subjects_parsed'] = json.loads(student_dict['subjects'])
-                else:
-                    student_dict['subjects_parsed'] = []
-            except:
-                student_dict['subjects_parsed'] = []
-            
-            # Parse parent details
-            try:
-                if student_dict['parent_details']:
-                    student_dict['parent_details_parsed'] = json.loads(student_dict['parent_details'])
-                else:
-                    student_dict['parent_details_parsed'] = {}
-            except:
-                student_dict['parent_details_parsed'] = {}
-            
-            students_data.append(student_dict)
+        student_rows_html = [
+            render_student_row(student_record(student, subjects_by_student.get(student['id'], [])))
+            for student in students
+        ]
         
-        return render_template('teacher_dashboard.html', students=students_data)
+        return render_template(
+            'teacher_dashboard.html',
+            student_rows=student_rows_html,
+            search=search,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor
+        )
     except Exception as e:
         flash(f'Error loading dashboard: {str(e)}', 'error')
         return redirect(url_for('login'))
@@ -302,54 +2516,46 @@ def teacher_dashboard():
 @app.route('/chatbot')
 def chatbot():
     """Chatbot page (public access)"""
-    return render_template('chatbot.html', is_public=True)
+    response = make_response(render_template('chatbot.html', is_public=True))
+    # Same bytes for every visitor, so let proxies revalidate it by ETag
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['PUBLIC_PAGE_MAX_AGE']
+    return response.make_conditional(request)
+
+def cached_chatbot_answer(kb, user_message):
+    """Return (answer, JSON body) for a public chatbot message, cached per knowledge base version"""
+    key = (kb.version, user_message)
+    cached = chatbot_responses.get(key)
+    metrics.inc('chatbot_cache_total', result='miss' if cached is None else 'hit')
+    if cached is None:
+        category, answer = chatbot_kb.answer(kb, user_message)
+        body = app.json.dumps({'response': answer, 'kb_version': kb.version})
+        cached = (category, answer, body)
+        chatbot_responses.put(key, cached)
+    # Counted per request, so cache hits show up in the intent rates too
+    metrics.inc('chatbot_intent_total', bot='public', intent=cached[0] or 'none')
+    return cached[1:]
 
 @app.route('/chatbot/message', methods=['POST'])
+@rate_limited
 def chatbot_message():
     """Handle chatbot messages (public access)"""
-    user_message = request.json.get('message', '').strip().lower()
-    
-    # Simple rule-based chatbot responses
-    responses = {
-        'course': {
-            'keywords': ['course', 'courses', 'program', 'programs', 'degree', 'degrees', 'bca', 'bsc', 'bcom', 'bba', 'ca'],
-            'response': 'Sri Aravindhar Arts and Science College offers the following courses:\n\nAll courses are 3-year programs with 6 semesters, affiliated to Annamalai University.\n\n📚 COMPUTER SCIENCE DEPARTMENT:\n\n• BCA (Bachelor of Computer Applications)\n  Subjects: Programming in C, Data Structures, Database Management, Web Technologies, Software Engineering, Computer Networks, Operating Systems, Object-Oriented Programming, Java Programming, Python Programming, Mobile Application Development, Cloud Computing\n\n• BSc CS (Bachelor of Science in Computer Science)\n  Subjects: Programming Fundamentals, Data Structures & Algorithms, Database Systems, Computer Networks, Operating Systems, Software Engineering, Web Development, Mobile Computing, Artificial Intelligence, Machine Learning, Cloud Computing, Cyber Security\n\n🔢 MATHEMATICS DEPARTMENT:\n\n• BSc Maths (Bachelor of Science in Mathematics)\n  Subjects: Algebra, Calculus, Differential Equations, Statistics, Probability, Linear Algebra, Discrete Mathematics, Numerical Methods, Mathematical Modeling, Operations Research, Graph Theory, Real Analysis\n\n🔬 SCIENCE DEPARTMENT:\n\n• BSc Chemistry\n  Subjects: Organic Chemistry, Inorganic Chemistry, Physical Chemistry, Analytical Chemistry, Biochemistry, Environmental Chemistry, Industrial Chemistry, Polymer Chemistry, Spectroscopy, Quantum Chemistry, Green Chemistry, Medicinal Chemistry\n\n• BSc Physics\n  Subjects: Mechanics, Thermodynamics, Electromagnetism, Optics, Quantum Mechanics, Nuclear Physics, Solid State Physics, Electronics, Mathematical Physics, Statistical Physics, Astrophysics, Modern Physics\n\n💼 COMMERCE DEPARTMENT:\n\n• BCom (Bachelor of Commerce)\n  Subjects: Financial Accounting, Cost Accounting, Management Accounting, Business Law, Corporate Law, Income Tax, Banking & Insurance, Business Statistics, Business Mathematics, Marketing Management, Human Resource Management, Entrepreneurship\n\n📊 BUSINESS DEPARTMENT:\n\n• BBA (Bachelor of Business Administration)\n  Subjects: Principles of Management, Marketing Management, Financial Management, Human Resource Management, Operations Management, Business Statistics, Business Law, Organizational Behavior, Strategic Management, Entrepreneurship, International Business, Business Communication\n\n• CA (Chartered Accountancy)\n  Subjects: Financial Accounting, Cost Accounting, Management Accounting, Auditing, Taxation, Corporate Law, Business Law, Financial Management, Information Technology, Economics, Business Mathematics, Statistics\n\nFor admission details, contact: 6381706363'
-        },
-        'fee': {
-            'keywords': ['fee', 'fees', 'cost', 'price', 'tuition', 'payment'],
-            'response': 'Our semester fee is ₹12,000 per semester. For detailed fee information and payment options, please contact the college office.'
-        },
-        'admission': {
-            'keywords': ['admission', 'admit', 'apply', 'application', 'enroll', 'enrollment'],
-            'response': 'Admissions are open! You can apply online through our website or visit the admissions office. Required documents include 10th and 12th mark sheets, ID proof, and passport photos. Application deadline is usually in May.'
-        },
-        'timing': {
-            'keywords': ['time', 'timing', 'schedule', 'hours', 'when', 'open'],
-            'response': 'College timings are Monday to Friday, 9:30 AM to 3:30 PM. Office hours are 9:30 AM to 3:30 PM.'
-        },
-        'contact': {
-            'keywords': ['contact', 'phone', 'email', 'address', 'location', 'where'],
-            'response': 'You can contact us at:\nPhone: 6381706363\nEmail: akashadhithyan11707@gmail.com\nAddress: Sedharapet, Vannur, Tamil Nadu\nOffice Hours: 9:30 AM - 3:30 PM (Mon-Fri)'
-        },
-        'greeting': {
-            'keywords': ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening'],
-            'response': 'Hello! Welcome to Sri Aravindhar Arts and Science College Chatbot.\n\nWe offer 3-year degree programs with 6 semesters across multiple departments.\n\nHow can I help you today? I can assist with:\n- Courses and subjects (7-8+ subjects per course)\n- Fees (₹12,000 per semester)\n- Admissions\n- Timings (9:30 AM - 3:30 PM)\n- Contact Information'
-        },
-        'college': {
-            'keywords': ['college', 'name', 'institution', 'university'],
-            'response': 'Sri Aravindhar Arts and Science College, affiliated to Annamalai University.\n\n📍 Location: Sedharapet, Vannur, Tamil Nadu\n\n📅 Duration: All courses are 3-year programs\n\n📚 Semesters: 6 semesters (2 semesters per year)\n\n🎓 Programs Offered:\n- BCA, BSc CS, BSc Maths, BSc Chemistry, BSc Physics\n- BCom, BBA, CA\n\nEach course includes 7-8+ subjects per semester, providing comprehensive education in respective fields.'
-        }
-    }
-    
-    # Find matching response
-    bot_response = "I'm here to help! Sri Aravindhar Arts and Science College offers 3-year programs with 6 semesters.\n\nYou can ask me about:\n- Courses and Subjects (7-8+ subjects per course)\n- Fees (₹12,000 per semester)\n- Admissions\n- Timings (9:30 AM - 3:30 PM)\n- Contact Information\n- College Name\n\nWhat would you like to know?"
-    
-    for category, data in responses.items():
-        if any(keyword in user_message for keyword in data['keywords']):
-            bot_response = data['response']
-            break
-    
-    return jsonify({'response': bot_response})
+    user_message = normalize_message(request.json.get('message', ''))
+    kb = chatbot_kb.current()
+    _, body = cached_chatbot_answer(kb, user_message)
+    return app.response_class(body, mimetype='application/json')
+
+@app.route('/chatbot/message/stream', methods=['POST'])
+@rate_limited
+def chatbot_stream():
+    """Stream chatbot answers as Server-Sent Events (public access)"""
+    user_message = normalize_message(request.json.get('message', ''))
+    kb = chatbot_kb.current()
+    answer, _ = cached_chatbot_answer(kb, user_message)
+    # One event per paragraph, separators kept so the chunks join back up
+    chunks = re.split(r'(?<=\n\n)', answer)
+    return sse_response((chunk for chunk in chunks if chunk), kb_version=kb.version)
 
 @app.route('/student/chatbot')
 def student_chatbot():
@@ -360,6 +2566,7 @@ def student_chatbot():
     return render_template('student_chatbot.html', is_public=False)
 
 @app.route('/student/chatbot/message', methods=['POST'])
+@rate_limited
 def student_chatbot_message():
     """Handle student chatbot messages (requires login)"""
     if 'user_id' not in session or session['role'] != 'student':
@@ -367,95 +2574,88 @@ def student_chatbot_message():
     
     user_message = request.json.get('message', '').strip().lower()
     
-    conn = get_db_connection()
-    user = conn.execute(
-        'SELECT * FROM users WHERE id = ?', (session['user_id'],)
-    ).fetchone()
-    conn.close()
+    profile = get_student_profile(session['user_id'])
+    if profile is None:
+        return jsonify({'error': 'Student not found'}), 404
     
-    # Parse student data
-    marks = {}
-    arrears = []
-    subjects = []
-    chatbot_questions = []
+    return jsonify({'response': ''.join(student_reply(profile, user_message))})
+
+@app.route('/student/chatbot/message/stream', methods=['POST'])
+@rate_limited
+def student_chatbot_stream():
+    """Stream student chatbot answers as Server-Sent Events (requires login)"""
+    if 'user_id' not in session or session['role'] != 'student':
+        return jsonify({'error': 'Access denied'}), 403
     
-    if user['semester_marks']:
-        try:
-            marks = json.loads(user['semester_marks']) if user['semester_marks'] else {}
-        except:
-            marks = {}
+    user_message = request.json.get('message', '').strip().lower()
     
-    if user['arrears']:
-        try:
-            arrears = json.loads(user['arrears']) if user['arrears'] else []
-        except:
-            arrears = []
+    profile = get_student_profile(session['user_id'])
+    if profile is None:
+        return jsonify({'error': 'Student not found'}), 404
     
-    if user['subjects']:
-        try:
-            subjects = json.loads(user['subjects']) if user['subjects'] else []
-        except:
-            subjects = []
+    return sse_response(student_reply(profile, user_message))
+
+def student_reply(profile, user_message):
+    """Yield the student chatbot's answer in chunks, one marks semester at a time"""
+    marks = profile['marks']
+    arrears = profile['arrears']
+    subjects = profile['subjects']
     
-    if user['chatbot_questions']:
-        try:
-            chatbot_questions = json.loads(user['chatbot_questions']) if user['chatbot_questions'] else []
-        except:
-            chatbot_questions = []
+    # Check custom chatbot questions first, then the shared question bank
+    message_terms = tokenize_text(user_message)
+    for source, qa_index in (('custom_qa', profile['qa_index']),
+                             ('question_bank', get_question_bank_index(profile['department'], profile['bank_version']))):
+        matches = qa_index.search(message_terms, limit=1)
+        if matches:
+            metrics.inc('chatbot_intent_total', bot='student', intent=source)
+            yield matches[0][2]
+            return
     
-    # Check custom chatbot questions first
-    for qa in chatbot_questions:
-        if isinstance(qa, dict) and 'question' in qa and 'answer' in qa:
-            question_lower = qa['question'].lower()
-            if question_lower in user_message or user_message in question_lower:
-                return jsonify({'response': qa['answer']})
+    topic = student_intents.match(user_message)
+    metrics.inc('chatbot_intent_total', bot='student', intent=topic or 'none')
     
     # Check for marks-related queries
-    marks_keywords = ['mark', 'grade', 'score', 'semester', 'cgpa', 'percentage', 'result']
-    if any(keyword in user_message for keyword in marks_keywords):
+    if topic == 'marks':
         if marks:
-            response = "Here are your semester marks:\n\n"
+            yield "Here are your semester marks:\n\n"
             for semester, subjects_data in sorted(marks.items()):
                 if isinstance(subjects_data, dict):
-                    response += f"📚 Semester {semester}:\n"
+                    section = f"📚 Semester {semester}:\n"
                     for subject, mark in subjects_data.items():
-                        response += f"  • {subject}: {mark}\n"
-                    response += "\n"
+                        section += f"  • {subject}: {mark}\n"
+                    yield section + "\n"
                 else:
                     # Legacy format support
-                    response += f"Semester {semester}: {subjects_data}\n"
-            return jsonify({'response': response})
+                    yield f"Semester {semester}: {subjects_data}\n"
         else:
-            return jsonify({'response': "No marks available yet. Please contact your teacher for updates."})
+            yield "No marks available yet. Please contact your teacher for updates."
+        return
     
     # Check for arrears-related queries
-    arrears_keywords = ['arrear', 'backlog', 'failed', 'clear', 'clearance']
-    if any(keyword in user_message for keyword in arrears_keywords):
+    if topic == 'arrears':
         if arrears:
-            response = "Here is your arrears status:\n\n"
+            yield "Here is your arrears status:\n\n"
             for arrear in arrears:
                 if isinstance(arrear, dict):
                     subject = arrear.get('subject', 'Unknown')
                     status = arrear.get('status', 'Unknown')
-                    response += f"{subject}: {status}\n"
-            return jsonify({'response': response})
+                    yield f"{subject}: {status}\n"
         else:
-            return jsonify({'response': "✅ Great news! You have no arrears."})
+            yield "✅ Great news! You have no arrears."
+        return
     
     # Check for subjects-related queries
-    subjects_keywords = ['subject', 'subjects', 'course', 'courses']
-    if any(keyword in user_message for keyword in subjects_keywords):
+    if topic == 'subjects':
         if subjects:
-            response = "Your subjects are:\n\n"
+            yield "Your subjects are:\n\n"
             for i, subject in enumerate(subjects, 1):
-                response += f"{i}. {subject}\n"
-            return jsonify({'response': response})
+                yield f"{i}. {subject}\n"
         else:
-            return jsonify({'response': "No subjects registered yet. Please contact your teacher."})
+            yield "No subjects registered yet. Please contact your teacher."
+        return
     
     # Default response
-    default_response = f"Hello {user['name'] or 'Student'}! I can help you with:\n- Your marks and grades\n- Arrears status\n- Your subjects\n- Custom questions set by your teacher\n\nWhat would you like to know?"
-    return jsonify({'response': default_response})
+    yield f"Hello {profile['name'] or 'Student'}! I can help you with:\n- Your marks and grades\n- Arrears status\n- Your subjects\n- Custom questions set by your teacher\n\nWhat would you like to know?"
 
 @app.route('/profile')
 def profile():
@@ -466,30 +2666,17 @@ def profile():
     
     try:
         conn = get_db_connection()
-        user = conn.execute(
-            'SELECT * FROM users WHERE id = ?', (session['user_id'],)
-        ).fetchone()
-        conn.close()
+        user = select_user(conn, 'profile', 'id = ?', (session['user_id'],))
         
         if not user:
+            conn.close()
             flash('User not found', 'error')
             return redirect(url_for('login'))
         
-        # Parse JSON fields safely
-        subjects = []
-        parent_details = {}
-        
-        if user['subjects']:
-            try:
-                subjects = json.loads(user['subjects']) if user['subjects'] else []
-            except:
-                subjects = []
+        subjects = fetch_subjects(conn, session['user_id'])
+        conn.close()
         
-        if user['parent_details']:
-            try:
-                parent_details = json.loads(user['parent_details']) if user['parent_details'] else {}
-            except:
-                parent_details = {}
+        parent_details = user.json('parent_details', {})
         
         return render_template('profile.html', user=user, subjects=subjects, parent_details=parent_details)
     except Exception as e:
@@ -537,25 +2724,31 @@ def add_student():
         conn.close()
         return jsonify({'error': 'Email/Phone already exists'}), 400
     
+    hashed_password = hash_password(password)
+    
     photo_path = None
     if photo and photo.filename:
         if allowed_file(photo.filename):
-            filename = secure_filename(f"{email_phone}_{photo.filename}")
-            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            photo.save(photo_path)
-            photo_path = f"images/{filename}"
-    
-    hashed_password = generate_password_hash(password)
+            try:
+                photo_path = store_photo(photo)
+            except ValueError as e:
+                conn.close()
+                return jsonify({'error': str(e)}), 400
     
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             INSERT INTO users (email_phone, password, role, name, roll_number, department, photo_path)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (email_phone, hashed_password, 'student', name, roll_number, department, photo_path))
         conn.commit()
+        queue_photo_variants(photo_path)
+        response = student_row_response(conn, cursor.lastrowid, 'Student added successfully')
         conn.close()
-        return jsonify({'success': True, 'message': 'Student added successfully'})
+        return response
     except Exception as e:
+        # The stored file is content-addressed; keep it only if another user shares it
+        conn.rollback()
+        delete_photo_if_unused(conn, photo_path)
         conn.close()
         return jsonify({'error': str(e)}), 500
 
@@ -593,7 +2786,6 @@ def edit_student(student_id):
         subjects = []
         if subjects_str:
             subjects = [s.strip() for s in subjects_str.split(',') if s.strip()]
-        subjects_json = json.dumps(subjects) if subjects else None
         
         # Convert age to integer if provided
         age_int = None
@@ -613,12 +2805,15 @@ def edit_student(student_id):
             
             conn.execute('''
                 UPDATE users SET name = ?, roll_number = ?, department = ?, age = ?, 
-                blood_group = ?, parent_details = ?, subjects = ?
+                blood_group = ?, parent_details = ?
                 WHERE id = ? AND role = ?
-            ''', (name, roll_number, department, age_int, blood_group, parent_details_json, subjects_json, student_id, 'student'))
+            ''', (name, roll_number, department, age_int, blood_group, parent_details_json, student_id, 'student'))
+            replace_subjects(conn, student_id, subjects)
             conn.commit()
+            student_profiles.invalidate(student_id)
+            response = student_row_response(conn, student_id, 'Student updated successfully')
             conn.close()
-            return jsonify({'success': True, 'message': 'Student updated successfully'})
+            return response
         except sqlite3.Error as e:
             conn.close()
             return jsonify({'error': f'Database error: {str(e)}'}), 500
@@ -638,12 +2833,14 @@ def reset_password(student_id):
     
     conn = get_db_connection()
     try:
-        hashed_password = generate_password_hash(new_password)
+        hashed_password = hash_password(new_password)
         conn.execute('''
             UPDATE users SET password = ? WHERE id = ? AND role = ?
         ''', (hashed_password, student_id, 'student'))
         conn.commit()
         conn.close()
+        # Anyone still logged in with the old password is logged out
+        session_store.revoke(user_id=student_id)
         return jsonify({'success': True, 'message': 'Password reset successfully'})
     except Exception as e:
         conn.close()
@@ -659,15 +2856,17 @@ def delete_student(student_id):
     try:
         # Get photo path to delete file
         student = conn.execute('SELECT photo_path FROM users WHERE id = ?', (student_id,)).fetchone()
-        if student and student['photo_path']:
-            photo_file = os.path.join('static', student['photo_path'])
-            if os.path.exists(photo_file):
-                os.remove(photo_file)
         
         conn.execute('DELETE FROM users WHERE id = ? AND role = ?', (student_id, 'student'))
         conn.commit()
+        if student:
+            # Identical photos are stored once, so only remove it with its last user
+            delete_photo_if_unused(conn, student['photo_path'])
+        student_profiles.invalidate(student_id)
+        # The sessions rows went with the user; this drops any still cached here
+        session_store.revoke(user_id=student_id)
         conn.close()
-        return jsonify({'success': True, 'message': 'Student deleted successfully'})
+        return jsonify({'success': True, 'message': 'Student deleted successfully', 'deleted': student_id})
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
@@ -687,26 +2886,22 @@ def update_marks(student_id):
     
     conn = get_db_connection()
     try:
-        student = conn.execute('SELECT semester_marks FROM users WHERE id = ?', (student_id,)).fetchone()
-        current_marks = {}
-        if student and student['semester_marks']:
-            try:
-                current_marks = json.loads(student['semester_marks']) if student['semester_marks'] else {}
-            except:
-                current_marks = {}
-        
-        # Structure: {semester: {subject: marks}}
-        if semester not in current_marks:
-            current_marks[semester] = {}
-        current_marks[semester][subject] = marks
-        marks_json = json.dumps(current_marks)
+        if not is_student(conn, student_id):
+            conn.close()
+            return jsonify({'error': 'Student not found'}), 404
         
         conn.execute('''
-            UPDATE users SET semester_marks = ? WHERE id = ? AND role = ?
-        ''', (marks_json, student_id, 'student'))
+            INSERT INTO marks (student_id, semester, subject, value) VALUES (?, ?, ?, ?)
+            ON CONFLICT (student_id, semester, subject) DO UPDATE SET value = excluded.value
+        ''', (student_id, semester, subject, marks))
         conn.commit()
+        student_profiles.invalidate(student_id)
+        response = student_row_response(
+            conn, student_id, 'Marks updated successfully',
+            changes={'marks': {semester: {subject: marks}}}
+        )
         conn.close()
-        return jsonify({'success': True, 'message': 'Marks updated successfully'})
+        return response
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
@@ -725,27 +2920,22 @@ def update_arrears(student_id):
     
     conn = get_db_connection()
     try:
-        student = conn.execute('SELECT arrears FROM users WHERE id = ?', (student_id,)).fetchone()
-        current_arrears = []
-        if student and student['arrears']:
-            try:
-                current_arrears = json.loads(student['arrears']) if student['arrears'] else []
-            except:
-                current_arrears = []
-        
-        # Remove existing entry for this subject if exists
-        current_arrears = [a for a in current_arrears if a.get('subject') != subject]
-        
-        # Add new entry
-        current_arrears.append({'subject': subject, 'status': status})
-        arrears_json = json.dumps(current_arrears)
+        if not is_student(conn, student_id):
+            conn.close()
+            return jsonify({'error': 'Student not found'}), 404
         
         conn.execute('''
-            UPDATE users SET arrears = ? WHERE id = ? AND role = ?
-        ''', (arrears_json, student_id, 'student'))
+            INSERT INTO arrears (student_id, subject, status) VALUES (?, ?, ?)
+            ON CONFLICT (student_id, subject) DO UPDATE SET status = excluded.status
+        ''', (student_id, subject, status))
         conn.commit()
+        student_profiles.invalidate(student_id)
+        response = student_row_response(
+            conn, student_id, 'Arrears updated successfully',
+            changes={'arrears': [{'subject': subject, 'status': status}]}
+        )
         conn.close()
-        return jsonify({'success': True, 'message': 'Arrears updated successfully'})
+        return response
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
@@ -764,8 +2954,9 @@ def update_notes_link(student_id):
             UPDATE users SET notes_link = ? WHERE id = ? AND role = ?
         ''', (notes_link, student_id, 'student'))
         conn.commit()
+        response = student_row_response(conn, student_id, 'Notes link updated successfully')
         conn.close()
-        return jsonify({'success': True, 'message': 'Notes link updated successfully'})
+        return response
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
@@ -784,23 +2975,21 @@ def update_subject_notes(student_id):
     
     conn = get_db_connection()
     try:
-        student = conn.execute('SELECT subject_notes FROM users WHERE id = ?', (student_id,)).fetchone()
-        current_notes = {}
-        if student and student['subject_notes']:
-            try:
-                current_notes = json.loads(student['subject_notes']) if student['subject_notes'] else {}
-            except:
-                current_notes = {}
-        
-        current_notes[subject] = notes_link
-        notes_json = json.dumps(current_notes)
+        if not is_student(conn, student_id):
+            conn.close()
+            return jsonify({'error': 'Student not found'}), 404
         
         conn.execute('''
-            UPDATE users SET subject_notes = ? WHERE id = ? AND role = ?
-        ''', (notes_json, student_id, 'student'))
+            INSERT INTO subject_notes (student_id, subject, link) VALUES (?, ?, ?)
+            ON CONFLICT (student_id, subject) DO UPDATE SET link = excluded.link
+        ''', (student_id, subject, notes_link))
         conn.commit()
+        response = student_row_response(
+            conn, student_id, 'Subject notes updated successfully',
+            changes={'subject_notes': {subject: notes_link}}
+        )
         conn.close()
-        return jsonify({'success': True, 'message': 'Subject notes updated successfully'})
+        return response
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
@@ -829,14 +3018,22 @@ def update_chatbot_questions(student_id):
     except json.JSONDecodeError:
         return jsonify({'error': 'Invalid JSON format'}), 400
     
+    unsearchable = unsearchable_question(questions)
+    if unsearchable is not None:
+        return jsonify({'error': f'Question "{unsearchable}" has no searchable words; add a keyword to it'}), 400
+    
     conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE users SET chatbot_questions = ? WHERE id = ? AND role = ?
-        ''', (questions_json, student_id, 'student'))
+        if not is_student(conn, student_id):
+            conn.close()
+            return jsonify({'error': 'Student not found'}), 404
+        
+        replace_chatbot_questions(conn, student_id, questions)
         conn.commit()
+        student_profiles.invalidate(student_id)
+        response = student_row_response(conn, student_id, 'Chatbot questions updated successfully')
         conn.close()
-        return jsonify({'success': True, 'message': 'Chatbot questions updated successfully'})
+        return response
     except Exception as e:
         conn.close()
         return jsonify({'error': str(e)}), 500
@@ -849,17 +3046,289 @@ def get_chatbot_questions(student_id):
     
     try:
         conn = get_db_connection()
-        student = conn.execute('SELECT chatbot_questions FROM users WHERE id = ?', (student_id,)).fetchone()
+        questions = fetch_chatbot_questions(conn, student_id)
         conn.close()
         
-        if student and student['chatbot_questions']:
-            try:
-                questions = json.loads(student['chatbot_questions'])
-                return jsonify({'success': True, 'questions': questions})
-            except json.JSONDecodeError:
-                return jsonify({'success': True, 'questions': []})
-        else:
-            return jsonify({'success': True, 'questions': []})
+        return jsonify({'success': True, 'questions': questions})
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@app.route('/teacher/import-marks', methods=['POST'])
+def import_marks():
+    """Bulk import marks from CSV/JSON rows of roll_number, semester, subject, marks (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    rows = import_rows_from_request()
+    if rows is None:
+        return jsonify({'error': 'Upload a CSV/JSON file or send {"rows": [...]}'}), 400
+    
+    result = bulk_import(
+        rows,
+        MARKS_IMPORT_FIELDS,
+        required=MARKS_IMPORT_FIELDS,
+        build_params=lambda student_id, row: (student_id, row['semester'], row['subject'], row['marks']),
+        sql='''
+            INSERT INTO marks (student_id, semester, subject, value) VALUES (?, ?, ?, ?)
+            ON CONFLICT (student_id, semester, subject) DO UPDATE SET value = excluded.value
+        '''
+    )
+    if 'error' in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+@app.route('/teacher/import-arrears', methods=['POST'])
+def import_arrears():
+    """Bulk import arrears from CSV/JSON rows of roll_number, subject, status (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    rows = import_rows_from_request()
+    if rows is None:
+        return jsonify({'error': 'Upload a CSV/JSON file or send {"rows": [...]}'}), 400
+    
+    result = bulk_import(
+        rows,
+        ARREARS_IMPORT_FIELDS,
+        required=('roll_number', 'subject'),
+        build_params=lambda student_id, row: (student_id, row['subject'], row['status']),
+        sql='''
+            INSERT INTO arrears (student_id, subject, status) VALUES (?, ?, ?)
+            ON CONFLICT (student_id, subject) DO UPDATE SET status = excluded.status
+        '''
+    )
+    if 'error' in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+@app.route('/teacher/import-students', methods=['POST'])
+def import_students():
+    """Bulk add students from CSV/JSON rows of email_phone, password, name, roll_number, department (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    rows = import_rows_from_request()
+    if rows is None:
+        return jsonify({'error': 'Upload a CSV/JSON file or send {"rows": [...]}'}), 400
+    
+    errors = []
+    pending = []
+    seen = set()
+    try:
+        for number, item in rows:
+            if not isinstance(item, dict):
+                errors.append({'row': number, 'error': 'Row must be an object'})
+                continue
+            row = {field: import_value(item, field) for field in STUDENT_IMPORT_FIELDS}
+            if not row['email_phone'] or not row['password']:
+                errors.append({'row': number, 'error': 'Email/Phone and Password are required'})
+            elif not (is_valid_email(row['email_phone']) or is_valid_phone(row['email_phone'])):
+                errors.append({'row': number, 'error': f"Invalid email or phone format: {row['email_phone']}"})
+            elif row['email_phone'] in seen:
+                errors.append({'row': number, 'error': f"Duplicate in upload: {row['email_phone']}"})
+            else:
+                seen.add(row['email_phone'])
+                pending.append((number, row))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': f'Could not parse upload: {str(e)}'}), 400
+    
+    conn = get_db_connection()
+    try:
+        # One set-based probe of the email_phone unique index for the whole batch
+        existing = {
+            row['email_phone']
+            for row in conn.execute(
+                'SELECT email_phone FROM users WHERE email_phone IN (SELECT value FROM json_each(?))',
+                (json.dumps(sorted(seen)),)
+            )
+        }
+        duplicates = []
+        new_rows = []
+        for number, row in pending:
+            if row['email_phone'] in existing:
+                duplicates.append(row['email_phone'])
+                errors.append({'row': number, 'error': f"Email/Phone already exists: {row['email_phone']}"})
+            else:
+                new_rows.append(row)
+        
+        hashed = hash_passwords([row['password'] for row in new_rows])
+        
+        with conn:
+            cursor = conn.executemany('''
+                INSERT OR IGNORE INTO users (email_phone, password, role, name, roll_number, department)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (row['email_phone'], password, 'student', row['name'], row['roll_number'], row['department'])
+                for row, password in zip(new_rows, hashed)
+            ])
+        imported = cursor.rowcount
+        conn.close()
+    except Exception as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    
+    errors.sort(key=lambda e: e['row'])
+    return jsonify({
+        'success': True,
+        'imported': imported,
+        'students': imported,
+        'failed': len(errors),
+        'duplicates': duplicates,
+        'errors': errors[:app.config['IMPORT_MAX_ERRORS']]
+    })
+
+@app.route('/teacher/login-metrics')
+def login_metrics():
+    """Login password verification pool counters (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    stats = login_verifier.stats()
+    stats['offload_enabled'] = app.config['LOGIN_OFFLOAD_HASHING']
+    return jsonify(stats)
+
+@app.route('/teacher/rate-limit-metrics')
+def rate_limit_metrics():
+    """Chatbot rate limiter counters (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    stats = chatbot_limiter.stats()
+    stats['enabled'] = app.config['RATE_LIMIT_ENABLED']
+    return jsonify(stats)
+
+@app.route('/teacher/revoke-sessions', methods=['POST'])
+def revoke_sessions():
+    """Log out one student, or every student when no student_id is given (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    if app.config['SESSION_BACKEND'] != 'sqlite':
+        return jsonify({'error': 'Signed cookie sessions cannot be revoked; set SESSION_BACKEND to sqlite'}), 400
+    
+    student_id = request.form.get('student_id', '').strip()
+    if student_id:
+        if not student_id.isdigit():
+            return jsonify({'error': 'student_id must be a number'}), 400
+        revoked = session_store.revoke(user_id=int(student_id))
+    else:
+        revoked = session_store.revoke(role='student')
+    return jsonify({'success': True, 'message': f'Logged out {revoked} session(s)', 'revoked': revoked})
+
+@app.route('/teacher/changes')
+def student_changes():
+    """Students changed or deleted since a change version (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        since = int(request.args.get('since', '0'))
+    except ValueError:
+        return jsonify({'error': 'since must be a change version number'}), 400
+    limit = app.config['DASHBOARD_PAGE_SIZE']
+    
+    conn = get_db_connection()
+    version = current_change_version(conn)
+    rows = select_users(
+        conn, 'student_record', "role = 'student' AND version > ?", (since, limit + 1), ' ORDER BY version LIMIT ?'
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if more:
+        # Resume from the last row returned rather than skipping the rest
+        version = rows[-1]['version']
+    subjects_by_student = fetch_subjects_for(conn, [row['id'] for row in rows])
+    deleted = [row['user_id'] for row in conn.execute(
+        "SELECT user_id FROM deleted_users WHERE role = 'student' AND version > ? AND version <= ? ORDER BY version",
+        (since, version)
+    )]
+    conn.close()
+    
+    students = [student_record(row, subjects_by_student.get(row['id'], [])) for row in rows]
+    return jsonify({
+        'version': version,
+        'more': more,
+        'students': [dict(student, html=render_student_row(student)) for student in students],
+        'deleted': deleted
+    })
+
+def metrics_access_allowed():
+    """Whether the request may read /metrics: bearer token, allowed address or teacher login"""
+    token = app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    if token and secrets.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return True
+    allowed_ips = app.config['METRICS_ALLOWED_IPS']
+    if allowed_ips is None:
+        # Behind a proxy, local addresses are the proxy relaying outside traffic
+        allowed_ips = () if app.config['PROXY_FIX_HOPS'] else ('127.0.0.1', '::1')
+    return request.remote_addr in allowed_ips or session.get('role') == 'teacher'
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus metrics for this worker (local scrapers or teachers)"""
+    if not metrics_access_allowed():
+        return jsonify({'error': 'Access denied'}), 403
+    
+    gauges = []
+    for prefix, stats in (('login_verify', login_verifier.stats()), ('chatbot_rate_limit', chatbot_limiter.stats())):
+        for name, value in stats.items():
+            gauges.append((f'{prefix}_{name}', value, {}))
+    gauges.append(('chatbot_kb_info', 1, {'version': chatbot_kb.snapshot.version}))
+    conn = get_db_connection()
+    gauges.append(('data_change_version', current_change_version(conn), {}))
+    conn.close()
+    for name, cache in (('student_profiles', student_profiles), ('question_banks', question_banks),
+                        ('chatbot_responses', chatbot_responses), ('student_rows', student_rows),
+                        ('sessions', session_store.cache)):
+        gauges.append(('cache_entries', len(cache), {'cache': name}))
+    return app.response_class(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/teacher/update-question-bank', methods=['POST'])
+def update_question_bank():
+    """Update the class-wide chatbot question bank (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    department = request.form.get('department', '').strip()
+    questions_json = request.form.get('questions', '').strip()
+    
+    try:
+        questions = json.loads(questions_json) if questions_json else []
+        if not isinstance(questions, list):
+            return jsonify({'error': 'Questions must be an array'}), 400
+        for qa in questions:
+            if not isinstance(qa, dict) or 'question' not in qa or 'answer' not in qa:
+                return jsonify({'error': 'Each question must have "question" and "answer" fields'}), 400
+    except json.JSONDecodeError:
+        return jsonify({'error': 'Invalid JSON format'}), 400
+    
+    unsearchable = unsearchable_question(questions)
+    if unsearchable is not None:
+        return jsonify({'error': f'Question "{unsearchable}" has no searchable words; add a keyword to it'}), 400
+    
+    conn = get_db_connection()
+    try:
+        replace_question_bank(conn, department, questions)
+        conn.commit()
+        conn.close()
+        return jsonify({'success': True, 'message': 'Question bank updated successfully'})
+    except Exception as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/teacher/get-question-bank', methods=['GET'])
+def get_question_bank():
+    """Get the class-wide chatbot question bank (teacher only)"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        conn = get_db_connection()
+        questions = fetch_question_bank(conn, request.args.get('department', '').strip())
+        conn.close()
+        
+        return jsonify({'success': True, 'questions': questions})
     except Exception as e:
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
@@ -909,9 +3378,7 @@ def edit_teacher_profile():
     # GET request - show edit form
     try:
         conn = get_db_connection()
-        user = conn.execute(
-            'SELECT * FROM users WHERE id = ? AND role = ?', (session['user_id'], 'teacher')
-        ).fetchone()
+        user = select_user(conn, 'profile', 'id = ? AND role = ?', (session['user_id'], 'teacher'))
         conn.close()
         
         if not user:
@@ -936,14 +3403,162 @@ def internal_error(error):
 def handle_exception(e):
     # Log the error (in production, use proper logging)
     print(f"Error: {str(e)}")
+    metrics.inc('app_exceptions_total', type=type(e).__name__)
     return jsonify({'error': 'An error occurred. Please try again.'}), 500
 
-if __name__ == '__main__':
-    # Initialize database
+def precompile_templates():
+    """Compile every template up front so no request pays the Jinja compile cost"""
+    for name in app.jinja_env.list_templates():
+        if name.endswith('.html'):
+            app.jinja_env.get_template(name)
+
+# Serving
+def migrate():
+    """Create or upgrade the database and upload folder; run once per deploy, not per worker"""
     init_db()
+    os.makedirs(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), exist_ok=True)
+
+def init_app(app):
+    """Build the app's database pool, caches, rate limiter, session store and chatbot from its config
+
+    Importing the module builds none of them, so every setting (including
+    the ones that size caches or pick the session backend) can still be
+    changed before this runs. The objects are registered in
+    ``app.extensions['college']`` and bound to the module-level names the
+    handlers use; calling it again replaces them.
+    """
+    global db_pool, login_verifier, chatbot_limiter, chatbot_kb, session_store
+    global student_profiles, question_banks, student_rows, chatbot_responses
+    config = app.config
+    
+    # Take the client address (used by the rate limiter) and scheme from the
+    # headers set by trusted proxies instead of the proxy's own connection
+    if isinstance(app.wsgi_app, ProxyFix):
+        app.wsgi_app = app.wsgi_app.app
+    if config['PROXY_FIX_HOPS']:
+        hops = config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops, x_prefix=hops)
+    
+    if db_pool is not None:
+        db_pool.discard()
+    db_pool = ConnectionPool(
+        config['DATABASE'],
+        busy_timeout=config['DB_BUSY_TIMEOUT'],
+        mmap_size=config['DB_MMAP_SIZE']
+    )
+    login_verifier = PasswordVerifier(
+        workers=config['LOGIN_VERIFY_WORKERS'],
+        max_pending=config['LOGIN_VERIFY_MAX_PENDING'],
+        timeout=config['LOGIN_VERIFY_TIMEOUT']
+    )
+    chatbot_limiter = RateLimiter(shared=config['RATE_LIMIT_SHARED'], max_keys=config['RATE_LIMIT_MAX_KEYS'])
+    
+    student_profiles = TTLCache(maxsize=config['PROFILE_CACHE_SIZE'], ttl=config['PROFILE_CACHE_TTL'])
+    question_banks = TTLCache(maxsize=64, ttl=config['PROFILE_CACHE_TTL'])
+    student_rows = TTLCache(maxsize=config['DASHBOARD_ROW_CACHE_SIZE'], ttl=config['PROFILE_CACHE_TTL'])
+    chatbot_responses = TTLCache(maxsize=config['CHATBOT_CACHE_SIZE'], ttl=24 * 3600)
     
-    # Create upload folder if it doesn't exist
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    session_store = SQLiteSessionStore(
+        cache_size=config['SESSION_CACHE_SIZE'],
+        cache_ttl=config['SESSION_CACHE_TTL'],
+        sweep_interval=config['SESSION_SWEEP_INTERVAL']
+    )
+    if config['SESSION_BACKEND'] == 'sqlite':
+        app.session_interface = ServerSessionInterface(session_store)
+    else:
+        app.session_interface = SecureCookieSessionInterface()
     
-    # Run the app
+    # Relative paths are resolved against the app, not the working directory
+    chatbot_kb = IntentKnowledgeBase(
+        os.path.join(app.root_path, config['CHATBOT_INTENTS_FILE']),
+        check_interval=config['CHATBOT_RELOAD_INTERVAL'],
+        about_page=os.path.join(app.root_path, config['CHATBOT_ABOUT_PAGE']),
+        index_path=os.path.join(app.root_path, config['CHATBOT_INDEX_FILE']),
+        min_score=config['CHATBOT_PASSAGE_MIN_SCORE']
+    )
+    precompile_templates()
+    
+    app.extensions['college'] = {
+        'db_pool': db_pool,
+        'login_verifier': login_verifier,
+        'chatbot_limiter': chatbot_limiter,
+        'chatbot_kb': chatbot_kb,
+        'session_store': session_store,
+        'caches': {
+            'student_profiles': student_profiles,
+            'question_banks': question_banks,
+            'student_rows': student_rows,
+            'chatbot_responses': chatbot_responses
+        }
+    }
+
+def create_app(config=None):
+    """Apply config on top of the defaults and settings file, then build the app's services
+
+    A server that calls this before forking (gunicorn --preload) shares
+    the loaded templates and chatbot tables between workers. The schema is
+    left alone; run ``migrate()`` (``flask --app app init-db``) first.
+    """
+    if config:
+        app.config.update(config)
+    init_app(app)
+    return app
+
+def serve(host='0.0.0.0', port=5000, workers=None, threads=None):
+    """Run the app with several worker processes, using gunicorn when it is installed"""
+    workers = workers or app.config['SERVER_WORKERS']
+    threads = threads or app.config['SERVER_THREADS']
+    # Lets the per-process hashing pools split the CPUs between workers
+    create_app({'WORKER_PROCESSES': workers})
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+    
+    if BaseApplication is None:
+        # Werkzeug can fork a process per request or use threads, not both
+        from werkzeug.serving import run_simple
+        if workers > 1 and hasattr(os, 'fork'):
+            run_simple(host, port, app, processes=workers)
+        else:
+            run_simple(host, port, app, threaded=True)
+        return
+    
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # Chatbot answers stream over SSE, so allow long-lived requests
+            self.cfg.set('timeout', 120)
+        
+        def load(self):
+            return app
+    
+    # The app is already built here, so workers fork with it loaded
+    Server().run()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database schema."""
+    migrate()
+    click.echo(f"Database ready: {app.config['DATABASE']}")
+
+@app.cli.command('serve')
+@click.option('--host', default='0.0.0.0', show_default=True)
+@click.option('--port', default=5000, show_default=True)
+@click.option('--workers', type=int, help='Worker processes (default: SERVER_WORKERS).')
+@click.option('--threads', type=int, help='Threads per worker (default: SERVER_THREADS).')
+@click.option('--migrate/--no-migrate', 'run_migrations', default=True, help='Upgrade the schema before starting workers.')
+def serve_command(host, port, workers, threads, run_migrations):
+    """Run the production server with several workers."""
+    if run_migrations:
+        migrate()
+    serve(host, port, workers, threads)
+
+if __name__ == '__main__':
+    # Development server with the reloader; use `flask --app app serve` in production
+    migrate()
+    create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
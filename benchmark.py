@@ -0,0 +1,271 @@
+"""
+Benchmark harness for the College Chatbot
+Seeds a synthetic database per scale point and times the hot routes
+through Flask's test client.
+
+Usage:
+    python benchmark.py --students 100,1000,5000 --marks 24 --qas 10 --output results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import app as college
+
+PASSWORD = 'bench-password'
+DEPARTMENTS = ['CS', 'Maths', 'Physics', 'Chemistry', 'Commerce', 'Business']
+SUBJECTS = ['Maths', 'Physics', 'Chemistry', 'English', 'Tamil', 'Programming', 'Networks', 'Databases']
+PUBLIC_MESSAGES = [
+    'What courses do you offer?', 'What is the fee?', 'How do I apply for admission?',
+    'What are the college timings?', 'contact number', 'bsc physics subjects',
+    'is there cloud computing', 'placement support'
+]
+# Appended to public messages, with a counter, to make cache misses
+FILLER_WORDS = ['please', 'details', 'for 2025', 'info', 'quickly', 'thanks']
+STUDENT_MESSAGES = [
+    'What are my marks?', 'Do I have any arrears?', 'What are my subjects?',
+    'when is question 3 due', 'hello'
+]
+
+def seed_database(path, students, marks, qas):
+    """Create a database at path with the given number of students and rows each"""
+    college.app.config['DATABASE'] = path
+    college.db_pool.database = path
+    college.db_pool.discard()
+    college.init_db()
+
+    # One hash shared by every account keeps seeding fast; logins still verify it
+    pwhash = college.hash_password(PASSWORD)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO users (email_phone, password, role, name) VALUES (?, ?, 'teacher', ?)",
+        ('teacher@bench.local', pwhash, 'Bench Teacher')
+    )
+    rng = random.Random(students)
+    for start in range(0, students, 1000):
+        batch = range(start, min(start + 1000, students))
+        conn.executemany(
+            "INSERT INTO users (email_phone, password, role, name, roll_number, department) VALUES (?, ?, 'student', ?, ?, ?)",
+            [(f'student{i}@bench.local', pwhash, f'Student {i}', f'R{i:06d}', DEPARTMENTS[i % len(DEPARTMENTS)]) for i in batch]
+        )
+    ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'student' ORDER BY id")]
+    for start in range(0, len(ids), 1000):
+        batch = ids[start:start + 1000]
+        conn.executemany(
+            'INSERT INTO marks (student_id, semester, subject, value) VALUES (?, ?, ?, ?)',
+            [
+                (student_id, str(1 + n // len(SUBJECTS)), f'{SUBJECTS[n % len(SUBJECTS)]} {n // len(SUBJECTS) + 1}', str(rng.randint(35, 100)))
+                for student_id in batch for n in range(marks)
+            ]
+        )
+        conn.executemany(
+            'INSERT INTO subjects (student_id, position, subject) VALUES (?, ?, ?)',
+            [(student_id, position, subject) for student_id in batch for position, subject in enumerate(SUBJECTS[:6])]
+        )
+        conn.executemany(
+            'INSERT INTO arrears (student_id, subject, status) VALUES (?, ?, ?)',
+            [(student_id, 'Physics 1', 'Pending') for student_id in batch if student_id % 7 == 0]
+        )
+        questions = [(f'When is question {n} due', f'Answer {n}') for n in range(qas)]
+        conn.executemany(
+            'INSERT INTO chatbot_qa (student_id, position, question, answer) VALUES (?, ?, ?, ?)',
+            [(student_id, n, question, answer) for student_id in batch for n, (question, answer) in enumerate(questions)]
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO chatbot_qa_terms (student_id, position, term) VALUES (?, ?, ?)',
+            [
+                (student_id, n, term)
+                for student_id in batch
+                for n, (question, answer) in enumerate(questions)
+                for term in college.tokenize_text(question)
+            ]
+        )
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return ids
+
+def reset_caches():
+    """Start each scale point cold"""
+    college.student_profiles.clear()
+    college.question_banks.clear()
+    college.chatbot_responses.clear()
+    college.student_rows.clear()
+
+def login(client, email_phone):
+    response = client.post('/login', data={'email_phone': email_phone, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'Login failed for {email_phone}: {response.status_code}')
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(samples) - 1, math.ceil(fraction * len(samples)) - 1))
+    return samples[index]
+
+def measure(name, requests, call):
+    """Time call(i) for i in range(requests) and summarize the latencies"""
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(requests):
+        request_started = time.perf_counter()
+        status = call(i)
+        latencies.append(time.perf_counter() - request_started)
+        if status >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'endpoint': name,
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3)
+    }
+
+def measure_chatbot_cache(name, requests, call, warm=None):
+    """Like measure(), adding the answer cache hits and misses the phase produced"""
+    if warm is not None:
+        for i in range(len(PUBLIC_MESSAGES)):
+            warm(i)
+    hits = college.metrics.counter('chatbot_cache_total', result='hit')
+    misses = college.metrics.counter('chatbot_cache_total', result='miss')
+    result = measure(name, requests, call)
+    result['cache_hits'] = college.metrics.counter('chatbot_cache_total', result='hit') - hits
+    result['cache_misses'] = college.metrics.counter('chatbot_cache_total', result='miss') - misses
+    return result
+
+def run_scale(students, args):
+    """Seed one scale point and benchmark every route against it"""
+    workdir = tempfile.mkdtemp(prefix='college-bench-')
+    path = os.path.join(workdir, 'college.db')
+    seed_started = time.perf_counter()
+    ids = seed_database(path, students, args.marks, args.qas)
+    seed_seconds = time.perf_counter() - seed_started
+    reset_caches()
+    rng = random.Random(args.seed)
+
+    public = college.app.test_client()
+    teacher = college.app.test_client()
+    login(teacher, 'teacher@bench.local')
+    student_clients = []
+    for student_id in rng.sample(ids, min(args.sessions, len(ids))):
+        client = college.app.test_client()
+        login(client, f'student{student_id - ids[0]}@bench.local')
+        student_clients.append(client)
+
+    def public_chat_hit(i):
+        return public.post('/chatbot/message', json={'message': PUBLIC_MESSAGES[i % len(PUBLIC_MESSAGES)]}).status_code
+
+    def public_chat_miss(i):
+        # A request number the answer cache has never seen makes every message new
+        message = f"{PUBLIC_MESSAGES[i % len(PUBLIC_MESSAGES)].rstrip('?')} {rng.choice(FILLER_WORDS)} {i}"
+        return public.post('/chatbot/message', json={'message': message}).status_code
+
+    def student_chat(i):
+        client = student_clients[i % len(student_clients)]
+        return client.post('/student/chatbot/message', json={'message': STUDENT_MESSAGES[i % len(STUDENT_MESSAGES)]}).status_code
+
+    def dashboard(i):
+        return teacher.get('/teacher/dashboard').status_code
+
+    def dashboard_search(i):
+        return teacher.get(f'/teacher/dashboard?q=Student {rng.randrange(students)}').status_code
+
+    def login_student(i):
+        client = college.app.test_client()
+        return client.post('/login', data={
+            'email_phone': f'student{rng.randrange(students)}@bench.local', 'password': PASSWORD
+        }).status_code
+
+    def update_marks(i):
+        return teacher.post(f'/teacher/update-marks/{rng.choice(ids)}', data={
+            'semester': str(rng.randint(1, 6)), 'subject': rng.choice(SUBJECTS), 'marks': str(rng.randint(35, 100))
+        }).status_code
+
+    # Misses first, against a cold cache; the hit phase then cycles messages already answered
+    results = [
+        measure_chatbot_cache('chatbot_message_miss', args.requests, public_chat_miss),
+        measure_chatbot_cache('chatbot_message_hit', args.requests, public_chat_hit, warm=public_chat_hit),
+        measure('student_chatbot_message', args.requests, student_chat),
+        measure('teacher_dashboard', args.requests, dashboard),
+        measure('teacher_dashboard_search', args.requests, dashboard_search),
+        measure('login', args.login_requests, login_student),
+        measure('update_marks', args.requests, update_marks)
+    ]
+    for result in results:
+        result.update(students=students, marks_per_student=args.marks, qas_per_student=args.qas)
+
+    college.db_pool.discard()
+    if not args.keep_db:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.rmdir(workdir)
+    return {'students': students, 'seed_seconds': round(seed_seconds, 2), 'database': path if args.keep_db else None, 'results': results}
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the College Chatbot routes against synthetic data')
+    parser.add_argument('--students', default='100,1000', help='comma-separated scale points (students per database)')
+    parser.add_argument('--marks', type=int, default=24, help='marks rows per student')
+    parser.add_argument('--qas', type=int, default=10, help='custom chatbot Q&As per student')
+    parser.add_argument('--requests', type=int, default=300, help='requests per route and scale point')
+    parser.add_argument('--login-requests', type=int, default=20, help='requests for the (slow) login route')
+    parser.add_argument('--sessions', type=int, default=20, help='logged-in students used for the student chatbot')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for request parameters')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the JSON results')
+    parser.add_argument('--keep-db', action='store_true', help='keep the seeded databases for inspection')
+    args = parser.parse_args()
+
+    college.create_app({'TESTING': True, 'RATE_LIMIT_ENABLED': False})
+
+    runs = []
+    for students in [int(value) for value in args.students.split(',') if value.strip()]:
+        print(f'Seeding {students} students...', file=sys.stderr)
+        run = run_scale(students, args)
+        runs.append(run)
+        print(f"\n{students} students (seeded in {run['seed_seconds']}s)")
+        print(f"{'endpoint':<28}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'cache hit/miss':>16}")
+        for result in run['results']:
+            cache = f"{result['cache_hits']}/{result['cache_misses']}" if 'cache_hits' in result else ''
+            print(f"{result['endpoint']:<28}{result['throughput_rps']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}{cache:>16}")
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'settings': vars(args)
+        },
+        'runs': runs
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nResults written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -33,7 +33,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 10);
     }
 
-    // Add bot message to chat
+    // Add bot message to chat; returns the text element so streamed chunks can extend it
     function addBotMessage(message) {
         const messageDiv = document.createElement('div');
         messageDiv.className = 'message bot-message';
@@ -51,6 +51,7 @@ document.addEventListener('DOMContentLoaded', function() {
         setTimeout(() => {
             messageDiv.style.opacity = '1';
         }, 10);
+        return messageDiv.querySelector('p');
     }
 
     // Show typing indicator
@@ -80,12 +81,12 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // Send message to server
+    // Send message to server, rendering the answer as it streams in
     async function sendMessage(message) {
         try {
             showTypingIndicator();
             
-            const response = await fetch('/chatbot/message', {
+            const response = await fetch('/chatbot/message/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -93,12 +94,37 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: JSON.stringify({ message: message })
             });
 
-            const data = await response.json();
-            removeTypingIndicator();
+            if (response.status === 429) {
+                removeTypingIndicator();
+                addBotMessage('You are sending messages too quickly. Please wait a moment and try again.');
+                return;
+            }
+
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!response.ok || !response.body || !contentType.startsWith('text/event-stream')) {
+                removeTypingIndicator();
+                addBotMessage('Sorry, I encountered an error. Please try again.');
+                return;
+            }
+
+            let text = '';
+            let messageText = null;
+            await readEvents(response.body, function(event, data) {
+                if (event !== 'message') {
+                    return;
+                }
+                text += JSON.parse(data).chunk;
+                if (!messageText) {
+                    removeTypingIndicator();
+                    messageText = addBotMessage(text);
+                } else {
+                    messageText.innerHTML = formatMessage(text);
+                }
+                scrollToBottom();
+            });
 
-            if (response.ok) {
-                addBotMessage(data.response);
-            } else {
+            if (!messageText) {
+                removeTypingIndicator();
                 addBotMessage('Sorry, I encountered an error. Please try again.');
             }
         } catch (error) {
@@ -108,6 +134,37 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Read a Server-Sent Events body, calling onEvent(event, data) per event
+    async function readEvents(body, onEvent) {
+        const reader = body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                const data = [];
+                block.split('\n').forEach(function(line) {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data.push(line.slice(5).trim());
+                    }
+                });
+                if (data.length) {
+                    onEvent(event, data.join('\n'));
+                }
+            }
+        }
+    }
+
     // Handle form submission
     chatForm.addEventListener('submit', function(e) {
         e.preventDefault();
@@ -13,6 +13,16 @@ function closeAddStudentModal() {
     document.getElementById('addStudentModal').classList.remove('show');
 }
 
+function openImportModal() {
+    document.getElementById('importForm').reset();
+    document.getElementById('importResult').innerHTML = '';
+    document.getElementById('importModal').classList.add('show');
+}
+
+function closeImportModal() {
+    document.getElementById('importModal').classList.remove('show');
+}
+
 function openEditModal(studentId, name, rollNumber, department, age, bloodGroup, subjects, parentDetails) {
     document.getElementById('editStudentId').value = studentId;
     document.getElementById('editName').value = name || '';
@@ -180,6 +190,8 @@ function openChatbotQuestionsModalFromButton(button) {
 
 function openChatbotQuestionsModal(studentId) {
     document.getElementById('chatbotQuestionsStudentId').value = studentId;
+    document.getElementById('chatbotQuestionsTitle').textContent = 'Manage Chatbot Questions';
+    document.getElementById('questionBankDepartmentGroup').style.display = 'none';
     document.getElementById('chatbotQuestionsContainer').innerHTML = '';
     document.getElementById('chatbotQuestionsModal').classList.add('show');
     
@@ -187,6 +199,34 @@ function openChatbotQuestionsModal(studentId) {
     loadChatbotQuestions(studentId);
 }
 
+// The question bank reuses the chatbot questions modal with no student selected
+function openQuestionBankModal() {
+    document.getElementById('chatbotQuestionsStudentId').value = '';
+    document.getElementById('chatbotQuestionsTitle').textContent = 'Class Question Bank';
+    document.getElementById('questionBankDepartment').value = '';
+    document.getElementById('questionBankDepartmentGroup').style.display = 'block';
+    document.getElementById('chatbotQuestionsModal').classList.add('show');
+    loadQuestionBank();
+}
+
+async function loadQuestionBank() {
+    const department = document.getElementById('questionBankDepartment').value.trim();
+    document.getElementById('chatbotQuestionsContainer').innerHTML = '';
+    try {
+        const response = await fetch(`/teacher/get-question-bank?department=${encodeURIComponent(department)}`);
+        const data = await response.json();
+        
+        if (data.success && data.questions && data.questions.length > 0) {
+            data.questions.forEach(qa => addChatbotQuestionRow(qa.question || '', qa.answer || ''));
+        } else {
+            addChatbotQuestionRow('', '');
+        }
+    } catch (error) {
+        console.error('Error loading question bank:', error);
+        addChatbotQuestionRow('', '');
+    }
+}
+
 function closeChatbotQuestionsModal() {
     document.getElementById('chatbotQuestionsModal').classList.remove('show');
 }
@@ -268,6 +308,38 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
+// Patch a single table row from a write route's JSON response
+function patchStudentRow(data) {
+    if (!data || !data.html || !data.student) {
+        return;
+    }
+    const tbody = document.querySelector('.students-table tbody');
+    if (!tbody) {
+        return;
+    }
+    const template = document.createElement('tbody');
+    template.innerHTML = data.html.trim();
+    const newRow = template.firstElementChild;
+    const existingRow = tbody.querySelector(`tr[data-student-row="${data.student.id}"]`);
+    
+    if (existingRow) {
+        existingRow.replaceWith(newRow);
+    } else {
+        const emptyCell = tbody.querySelector('.no-data');
+        if (emptyCell) {
+            emptyCell.closest('tr').remove();
+        }
+        tbody.prepend(newRow);
+    }
+}
+
+function removeStudentRow(studentId) {
+    const row = document.querySelector(`tr[data-student-row="${studentId}"]`);
+    if (row) {
+        row.remove();
+    }
+}
+
 // Close modals when clicking outside
 window.onclick = function(event) {
     const modals = document.querySelectorAll('.modal');
@@ -300,7 +372,9 @@ document.getElementById('addStudentForm').addEventListener('submit', async funct
         if (response.ok && data.success) {
             showNotification('Student added successfully!', 'success');
             closeAddStudentModal();
-            setTimeout(() => location.reload(), 1000);
+            patchStudentRow(data);
+            submitBtn.disabled = false;
+            submitBtn.innerHTML = originalText;
         } else {
             showNotification(data.error || 'Failed to add student', 'error');
             submitBtn.disabled = false;
@@ -336,7 +410,9 @@ document.getElementById('editStudentForm').addEventListener('submit', async func
         if (response.ok && data.success) {
             showNotification('Student updated successfully!', 'success');
             closeEditModal();
-            setTimeout(() => location.reload(), 1000);
+            patchStudentRow(data);
+            submitBtn.disabled = false;
+            submitBtn.innerHTML = originalText;
         } else {
             showNotification(data.error || 'Failed to update student', 'error');
             submitBtn.disabled = false;
@@ -404,7 +480,7 @@ async function deleteStudent(studentId) {
         
         if (response.ok && data.success) {
             showNotification('Student deleted successfully!', 'success');
-            setTimeout(() => location.reload(), 1000);
+            removeStudentRow(studentId);
         } else {
             showNotification(data.error || 'Failed to delete student', 'error');
         }
@@ -437,7 +513,9 @@ if (document.getElementById('updateMarksForm')) {
             if (response.ok && data.success) {
                 showNotification('Marks updated successfully!', 'success');
                 closeMarksModal();
-                setTimeout(() => location.reload(), 1000);
+                patchStudentRow(data);
+                submitBtn.disabled = false;
+                submitBtn.innerHTML = originalText;
             } else {
                 showNotification(data.error || 'Failed to update marks', 'error');
                 submitBtn.disabled = false;
@@ -475,7 +553,9 @@ if (document.getElementById('updateArrearsForm')) {
             if (response.ok && data.success) {
                 showNotification('Arrears updated successfully!', 'success');
                 closeArrearsModal();
-                setTimeout(() => location.reload(), 1000);
+                patchStudentRow(data);
+                submitBtn.disabled = false;
+                submitBtn.innerHTML = originalText;
             } else {
                 showNotification(data.error || 'Failed to update arrears', 'error');
                 submitBtn.disabled = false;
@@ -513,7 +593,9 @@ if (document.getElementById('updateNotesLinkForm')) {
             if (response.ok && data.success) {
                 showNotification('Notes link updated successfully!', 'success');
                 closeNotesLinkModal();
-                setTimeout(() => location.reload(), 1000);
+                patchStudentRow(data);
+                submitBtn.disabled = false;
+                submitBtn.innerHTML = originalText;
             } else {
                 showNotification(data.error || 'Failed to update notes link', 'error');
                 submitBtn.disabled = false;
@@ -551,7 +633,9 @@ if (document.getElementById('updateSubjectNotesForm')) {
             if (response.ok && data.success) {
                 showNotification('Subject notes added successfully!', 'success');
                 closeSubjectNotesModal();
-                setTimeout(() => location.reload(), 1000);
+                patchStudentRow(data);
+                submitBtn.disabled = false;
+                submitBtn.innerHTML = originalText;
             } else {
                 showNotification(data.error || 'Failed to add subject notes', 'error');
                 submitBtn.disabled = false;
@@ -565,6 +649,55 @@ if (document.getElementById('updateSubjectNotesForm')) {
     });
 }
 
+// Bulk Import
+if (document.getElementById('importForm')) {
+    document.getElementById('importForm').addEventListener('submit', async function(e) {
+        e.preventDefault();
+        
+        const importType = document.getElementById('importType').value;
+        const formData = new FormData();
+        formData.append('file', document.getElementById('importFile').files[0]);
+        const resultDiv = document.getElementById('importResult');
+        const submitBtn = this.querySelector('button[type="submit"]');
+        const originalText = submitBtn.innerHTML;
+        
+        submitBtn.disabled = true;
+        submitBtn.innerHTML = '<span class="loading"></span> Importing...';
+        resultDiv.innerHTML = '';
+        
+        try {
+            const response = await fetch(`/teacher/import-${importType}`, {
+                method: 'POST',
+                body: formData
+            });
+            
+            const data = await response.json();
+            
+            if (response.ok && data.success) {
+                showNotification(`Imported ${data.imported} rows for ${data.students} students`, 'success');
+                let summary = `<p>Imported ${data.imported} rows, ${data.failed} failed.</p>`;
+                if (data.errors && data.errors.length > 0) {
+                    summary += '<ul>' + data.errors.map(err =>
+                        `<li>Row ${err.row}: ${escapeHtml(err.error)}</li>`
+                    ).join('') + '</ul>';
+                }
+                resultDiv.innerHTML = summary;
+                // New students belong at the top of the first page
+                if (importType === 'students' && data.imported > 0) {
+                    setTimeout(() => location.reload(), 3000);
+                }
+            } else {
+                showNotification(data.error || 'Import failed', 'error');
+            }
+        } catch (error) {
+            showNotification('An error occurred. Please try again.', 'error');
+        }
+        
+        submitBtn.disabled = false;
+        submitBtn.innerHTML = originalText;
+    });
+}
+
 // Chatbot Questions Form Handler
 if (document.getElementById('chatbotQuestionsForm')) {
     document.getElementById('chatbotQuestionsForm').addEventListener('submit', async function(e) {
@@ -584,13 +717,20 @@ if (document.getElementById('chatbotQuestionsForm')) {
             }
         }
         
-        if (questions.length === 0) {
+        const isQuestionBank = !studentId;
+        if (questions.length === 0 && !isQuestionBank) {
             showNotification('Please add at least one question and answer', 'error');
             return;
         }
         
         const formData = new FormData();
         formData.append('questions', JSON.stringify(questions));
+        if (isQuestionBank) {
+            formData.append('department', document.getElementById('questionBankDepartment').value.trim());
+        }
+        const url = isQuestionBank
+            ? '/teacher/update-question-bank'
+            : `/teacher/update-chatbot-questions/${studentId}`;
         
         const submitBtn = this.querySelector('button[type="submit"]');
         const originalText = submitBtn.innerHTML;
@@ -599,7 +739,7 @@ if (document.getElementById('chatbotQuestionsForm')) {
         submitBtn.innerHTML = '<span class="loading"></span> Saving...';
         
         try {
-            const response = await fetch(`/teacher/update-chatbot-questions/${studentId}`, {
+            const response = await fetch(url, {
                 method: 'POST',
                 body: formData
             });
@@ -607,8 +747,10 @@ if (document.getElementById('chatbotQuestionsForm')) {
             const data = await response.json();
             
             if (response.ok && data.success) {
-                showNotification('Chatbot questions updated successfully!', 'success');
+                showNotification(data.message || 'Chatbot questions updated successfully!', 'success');
                 closeChatbotQuestionsModal();
+                submitBtn.disabled = false;
+                submitBtn.innerHTML = originalText;
             } else {
                 showNotification(data.error || 'Failed to update chatbot questions', 'error');
                 submitBtn.disabled = false;
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as college
+
+@pytest.fixture
+def app(tmp_path):
+    """The app on a fresh database in a temporary directory"""
+    app = college.create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'college.db'),
+        'RATE_LIMIT_ENABLED': False
+    })
+    college.init_db()
+    yield app
+    college.db_pool.discard()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+TEACHER_LOGIN = {'email_phone': 'teach@x.com', 'password': 'pw1234'}
+
+@pytest.fixture
+def teacher(app):
+    """A client logged in as a newly registered teacher"""
+    client = app.test_client()
+    client.post('/register', data=dict(TEACHER_LOGIN, role='teacher', name='Teacher'))
+    client.post('/login', data=TEACHER_LOGIN)
+    return client
+
+@pytest.fixture
+def public_matcher(app):
+    return college.chatbot_kb.current().matcher
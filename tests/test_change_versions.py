@@ -0,0 +1,38 @@
+import sqlite3
+
+def versions(app):
+    conn = sqlite3.connect(app.config['DATABASE'])
+    try:
+        counter = conn.execute('SELECT value FROM change_counter WHERE id = 1').fetchone()[0]
+        students = dict(conn.execute("SELECT roll_number, version FROM users WHERE role = 'student'"))
+        return counter, students
+    finally:
+        conn.close()
+
+def test_import_stamps_each_student_once(app, teacher):
+    for n in (1, 2):
+        teacher.post('/teacher/add-student', data={'email_phone': f's{n}@x.com', 'password': 'pw1234',
+                                                   'name': f'S{n}', 'roll_number': f'R{n}'})
+    before, _ = versions(app)
+    rows = [{'roll_number': 'R1', 'semester': '1', 'subject': subject, 'marks': '80'}
+            for subject in ('Maths', 'Physics', 'Chemistry')]
+    rows.append({'roll_number': 'R2', 'semester': '1', 'subject': 'Maths', 'marks': '70'})
+    result = teacher.post('/teacher/import-marks', json={'rows': rows}).get_json()
+    assert result['imported'] == 4
+
+    after, students = versions(app)
+    assert after == before + 2
+    assert sorted(students.values()) == [before + 1, before + 2]
+    changes = teacher.get(f'/teacher/changes?since={before}').get_json()
+    assert changes['version'] == after
+    assert len(changes['students']) == 2
+
+def test_single_writes_still_bump_the_version(app, teacher):
+    added = teacher.post('/teacher/add-student', data={'email_phone': 's1@x.com', 'password': 'pw1234',
+                                                       'name': 'S1', 'roll_number': 'R1'}).get_json()
+    before, _ = versions(app)
+    teacher.post(f"/teacher/update-marks/{added['student']['id']}",
+                 data={'semester': '1', 'subject': 'Maths', 'marks': '91'})
+    after, students = versions(app)
+    assert after > before
+    assert students['R1'] == after
@@ -0,0 +1,88 @@
+import pytest
+
+import app as college
+
+def full_response(category):
+    return college.chatbot_kb.current().matcher.responses[category]['response']
+
+def ask(client, message, url='/chatbot/message'):
+    response = client.post(url, json={'message': message})
+    assert response.status_code == 200
+    return response.get_json()['response']
+
+# The quick-question buttons of templates/chatbot.html
+@pytest.mark.parametrize('message, category', [
+    ('Tell me about courses', 'course'),
+    ('What are the fees?', 'fee'),
+    ('How to apply for admission?', 'admission'),
+    ('What are the college timings?', 'timing'),
+    ('Contact information', 'contact'),
+    ('College name', 'college'),
+])
+def test_public_quick_questions_get_the_whole_answer(client, message, category):
+    assert ask(client, message) == full_response(category)
+
+@pytest.mark.parametrize('message', [
+    'courses',
+    'list of courses',
+    'what courses do you offer',
+])
+def test_general_course_questions_list_every_course(client, message):
+    answer = ask(client, message)
+    assert answer == full_response('course')
+    assert 'BCA' in answer and 'BCom' in answer
+
+def test_greeting_keeps_the_help_menu(client):
+    assert ask(client, 'hello') == full_response('greeting')
+
+def test_specific_questions_get_one_paragraph(client):
+    answer = ask(client, 'bsc physics subjects')
+    assert 'Physics' in answer
+    assert answer != full_response('course')
+    assert 'BCom' not in answer
+
+def login_student(app, teacher):
+    """Return a client logged in as a student with marks, arrears and subjects"""
+    added = teacher.post('/teacher/add-student', data={
+        'email_phone': 'stud@x.com', 'password': 'pw1234', 'name': 'Stu',
+        'roll_number': 'R1', 'department': 'CSE'})
+    student_id = added.get_json()['student']['id']
+    teacher.post(f'/teacher/update-marks/{student_id}',
+                 data={'semester': '1', 'subject': 'Maths', 'marks': '91'})
+    teacher.post(f'/teacher/update-arrears/{student_id}',
+                 data={'subject': 'Physics', 'status': 'Pending'})
+    teacher.post(f'/teacher/edit-student/{student_id}',
+                 data={'name': 'Stu', 'roll_number': 'R1', 'department': 'CSE',
+                       'subjects': 'Maths, Physics'})
+    student = app.test_client()
+    student.post('/login', data={'email_phone': 'stud@x.com', 'password': 'pw1234'})
+    return student
+
+# The quick-question buttons of templates/student_chatbot.html
+@pytest.mark.parametrize('message, expected', [
+    ('What are my marks?', 'Maths: 91'),
+    ('Do I have any arrears?', 'Physics: Pending'),
+    ('What are my subjects?', '2. Physics'),
+    ('My semester results', 'Semester 1'),
+])
+def test_student_quick_questions(app, teacher, message, expected):
+    student = login_student(app, teacher)
+    assert expected in ask(student, message, '/student/chatbot/message')
+
+def test_stream_shares_the_answer_cache(client, monkeypatch):
+    college.chatbot_responses.clear()
+    answered = []
+    answer = college.chatbot_kb.answer
+    monkeypatch.setattr(college.chatbot_kb, 'answer',
+                        lambda kb, message: answered.append(message) or answer(kb, message))
+    ask(client, 'What are the fees?')
+    response = client.post('/chatbot/message/stream', json={'message': 'what are the fees'})
+    assert response.status_code == 200
+    assert answered == ['what are the fees']
+    assert 'event: done' in response.get_data(as_text=True)
+
+def test_intents_are_counted_on_cache_hits(client):
+    before = college.metrics.counter('chatbot_intent_total', bot='public', intent='fee')
+    for _ in range(5):
+        ask(client, 'fees')
+    assert college.metrics.counter('chatbot_intent_total', bot='public', intent='fee') == before + 5
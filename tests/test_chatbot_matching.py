@@ -0,0 +1,42 @@
+import pytest
+
+import app as college
+
+@pytest.mark.parametrize('message, category', [
+    ('fess', 'fee'),
+    ('what are the fess', 'fee'),
+    ('how do i get admision', 'admission'),
+    ('what is the tution', 'fee'),
+    ('class shedule', 'timing'),
+    ('contcat details', 'contact'),
+    ('about the colege', 'college'),
+])
+def test_misspelt_keywords_are_corrected(public_matcher, message, category):
+    assert public_matcher.match(message) == category
+
+@pytest.mark.parametrize('message', [
+    'i feel lost',
+    'is there a host family',
+    'i want to post a letter',
+    'feels great',
+    'cast',
+    'do you have an admin office',
+    'can i get an apple',
+])
+def test_real_words_are_not_treated_as_typos(public_matcher, message):
+    assert public_matcher.match(message) is None
+
+@pytest.mark.parametrize('message', ['clean', 'clean my room'])
+def test_student_bot_ignores_real_words(message):
+    assert college.student_intents.match(message) is None
+
+def test_student_bot_corrects_misspelt_topics():
+    assert college.student_intents.match('any arears') == 'arrears'
+    assert college.student_intents.match('my subjets') == 'subjects'
+
+def test_allowed_edits_grow_with_word_length():
+    assert college.fuzzy_max_distance('fee') == 0
+    assert college.fuzzy_max_distance('fess') == 1
+    assert college.fuzzy_max_distance('clean') == 1
+    assert college.fuzzy_max_distance('admision') == 1
+    assert college.fuzzy_max_distance('enrolement') == 2
@@ -0,0 +1,18 @@
+import sqlite3
+
+import app as college
+
+def test_helpers_keep_the_request_transaction(app):
+    with app.test_request_context():
+        conn = college.get_db_connection()
+        conn.execute("INSERT INTO users (email_phone, password, role, name) VALUES ('a@x.com', 'x', 'teacher', 'A')")
+        user_id = conn.execute("SELECT id FROM users WHERE email_phone = 'a@x.com'").fetchone()[0]
+        assert college.fetch_user_column(user_id, 'name') == 'A'
+        assert college.session_store.load('missing') is None
+        assert college.get_student_profile(user_id + 1) is None
+        assert conn.in_transaction
+        conn.commit()
+
+    check = sqlite3.connect(app.config['DATABASE'])
+    assert check.execute("SELECT name FROM users WHERE email_phone = 'a@x.com'").fetchone() == ('A',)
+    check.close()
@@ -0,0 +1,22 @@
+import sqlite3
+
+def test_zero_and_numeric_values_are_imported(app, teacher):
+    teacher.post('/teacher/add-student', data={'email_phone': 's1@x.com', 'password': 'pw1234',
+                                              'name': 'S1', 'roll_number': 'R1'})
+    rows = [{'roll_number': 'R1', 'semester': 1, 'subject': 'Maths', 'marks': 0}]
+    result = teacher.post('/teacher/import-marks', json={'rows': rows}).get_json()
+    assert result['imported'] == 1, result['errors']
+
+    conn = sqlite3.connect(app.config['DATABASE'])
+    assert conn.execute('SELECT semester, value FROM marks').fetchall() == [('1', '0')]
+    conn.close()
+
+def test_null_values_still_count_as_missing(teacher):
+    rows = [{'roll_number': 'R1', 'semester': '1', 'subject': 'Maths', 'marks': None}]
+    result = teacher.post('/teacher/import-marks', json={'rows': rows}).get_json()
+    assert result['errors'] == [{'row': 1, 'error': 'Missing marks'}]
+
+def test_student_rows_keep_falsy_values(teacher):
+    rows = [{'email_phone': 's0@x.com', 'password': 'pw1234', 'name': 'S0', 'roll_number': 0}]
+    result = teacher.post('/teacher/import-students', json={'rows': rows}).get_json()
+    assert result['imported'] == 1
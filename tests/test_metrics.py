@@ -0,0 +1,29 @@
+import pytest
+
+def scrape(client, remote_addr='127.0.0.1', **headers):
+    return client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': remote_addr})
+
+@pytest.fixture
+def metrics_config(app):
+    saved = {key: app.config[key] for key in ('METRICS_TOKEN', 'METRICS_ALLOWED_IPS', 'PROXY_FIX_HOPS')}
+    yield app.config
+    app.config.update(saved)
+
+def test_localhost_may_scrape_by_default(client):
+    response = scrape(client)
+    assert response.status_code == 200
+    assert b'cache_entries{cache="chatbot_responses"}' in response.data
+
+def test_outside_addresses_are_refused(client):
+    assert scrape(client, '203.0.113.7').status_code == 403
+
+def test_bearer_token_grants_access(client, metrics_config):
+    metrics_config['METRICS_TOKEN'] = 's3cret'
+    assert scrape(client, '203.0.113.7', Authorization='Bearer s3cret').status_code == 200
+    assert scrape(client, '203.0.113.7', Authorization='Bearer wrong').status_code == 403
+
+def test_localhost_is_not_trusted_behind_a_proxy(client, metrics_config):
+    metrics_config['PROXY_FIX_HOPS'] = 1
+    assert scrape(client).status_code == 403
+    metrics_config['METRICS_ALLOWED_IPS'] = ('10.0.0.5',)
+    assert scrape(client, '10.0.0.5').status_code == 200
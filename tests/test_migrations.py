@@ -0,0 +1,80 @@
+import json
+import sqlite3
+
+import app as college
+
+# users as created by init_db() before the migration runner existed
+BASELINE_SCHEMA = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email_phone TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('student', 'teacher')),
+        name TEXT,
+        roll_number TEXT,
+        department TEXT,
+        photo_path TEXT,
+        semester_marks TEXT,
+        arrears TEXT,
+        notes_link TEXT,
+        subject_notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        age INTEGER,
+        blood_group TEXT,
+        parent_details TEXT,
+        chatbot_questions TEXT,
+        subjects TEXT
+    )
+'''
+
+def baseline_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.execute('''
+        INSERT INTO users (email_phone, password, role, name, roll_number, department,
+                           semester_marks, arrears, subject_notes, chatbot_questions, subjects)
+        VALUES ('s@x.com', 'x', 'student', 'Stu', 'R1', 'CS', ?, ?, ?, ?, ?)
+    ''', (
+        json.dumps({'1': {'Maths': 90, 'Physics': 75}, '2': 'A'}),
+        json.dumps([{'subject': 'Physics', 'status': 'Pending'}]),
+        json.dumps({'Maths': 'https://notes.example/maths'}),
+        json.dumps([{'question': 'When is the exam?', 'answer': 'Monday'}]),
+        json.dumps(['Maths', 'Physics'])
+    ))
+    conn.commit()
+    conn.close()
+
+def test_baseline_database_is_migrated(app, tmp_path, monkeypatch):
+    path = str(tmp_path / 'baseline.db')
+    baseline_database(path)
+    monkeypatch.setitem(app.config, 'DATABASE', path)
+
+    college.init_db()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(college.MIGRATIONS)
+    assert sorted(conn.execute('SELECT semester, subject, value FROM marks')) == [
+        ('1', 'Maths', '90'), ('1', 'Physics', '75'), ('2', 'Overall', 'A')
+    ]
+    assert conn.execute('SELECT subject, status FROM arrears').fetchall() == [('Physics', 'Pending')]
+    assert conn.execute('SELECT subject FROM subjects ORDER BY position').fetchall() == [('Maths',), ('Physics',)]
+    assert conn.execute('SELECT subject, link FROM subject_notes').fetchall() == [('Maths', 'https://notes.example/maths')]
+    assert conn.execute('SELECT question, answer FROM chatbot_qa').fetchall() == [('When is the exam?', 'Monday')]
+    assert conn.execute('''
+        SELECT semester_marks, arrears, subjects, subject_notes, chatbot_questions FROM users
+    ''').fetchone() == (None, None, None, None, None)
+    assert conn.execute('SELECT COUNT(*) FROM chatbot_qa_terms').fetchone()[0] > 0
+    conn.close()
+
+def test_second_run_changes_nothing(app, tmp_path, monkeypatch):
+    path = str(tmp_path / 'baseline.db')
+    baseline_database(path)
+    monkeypatch.setitem(app.config, 'DATABASE', path)
+    college.init_db()
+    conn = sqlite3.connect(path)
+    before = list(conn.iterdump())
+
+    college.init_db()
+
+    assert list(conn.iterdump()) == before
+    conn.close()
@@ -0,0 +1,39 @@
+import sqlite3
+
+import app as college
+
+def add_students(app, count):
+    conn = sqlite3.connect(app.config['DATABASE'])
+    # One shared created_at, so pages have to be told apart by id
+    conn.executemany(
+        "INSERT INTO users (email_phone, password, role, name, created_at) VALUES (?, 'x', 'student', ?, '2024-01-01 00:00:00')",
+        [(f's{n}@x.com', f'Student {n}') for n in range(count)]
+    )
+    conn.commit()
+    conn.close()
+
+def test_pages_cover_every_student_once(app):
+    add_students(app, 7)
+    with app.app_context():
+        conn = college.get_db_connection()
+        pages = []
+        cursor = None
+        while True:
+            students, cursor, _ = college.fetch_students_page(conn, after=cursor, page_size=3)
+            pages.append([student['id'] for student in students])
+            if cursor is None:
+                break
+    ids = [student_id for page in pages for student_id in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == 7
+
+def test_previous_page_returns_the_same_rows(app):
+    add_students(app, 7)
+    with app.app_context():
+        conn = college.get_db_connection()
+        first, after_first, _ = college.fetch_students_page(conn, page_size=3)
+        second, _, before_second = college.fetch_students_page(conn, after=after_first, page_size=3)
+        back, _, _ = college.fetch_students_page(conn, before=before_second, page_size=3)
+    assert [s['id'] for s in back] == [s['id'] for s in first]
+    assert not {s['id'] for s in second} & {s['id'] for s in first}
@@ -0,0 +1,27 @@
+import hashlib
+import io
+import os
+import sqlite3
+
+import app as college
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'orphan check ' + os.urandom(16)
+
+def photo_file():
+    return os.path.join(college.app.static_folder, college.PHOTO_STATIC_PREFIX,
+                        hashlib.sha256(PNG).hexdigest() + '.png')
+
+def test_failed_insert_removes_the_stored_photo(app, teacher):
+    conn = sqlite3.connect(app.config['DATABASE'])
+    conn.execute('''
+        CREATE TRIGGER reject_student BEFORE INSERT ON users WHEN new.email_phone = 'fail@x.com'
+        BEGIN SELECT RAISE(ABORT, 'rejected'); END
+    ''')
+    conn.commit()
+    conn.close()
+
+    response = teacher.post('/teacher/add-student', data={
+        'email_phone': 'fail@x.com', 'password': 'pw1234', 'name': 'Stu',
+        'photo': (io.BytesIO(PNG), 'photo.png')}, content_type='multipart/form-data')
+    assert response.status_code == 500
+    assert not os.path.exists(photo_file())
@@ -0,0 +1,33 @@
+import app as college
+
+from conftest import TEACHER_LOGIN
+
+def kill_children(pool):
+    for process in list(pool._processes.values()):
+        process.kill()
+        process.join()
+
+def test_login_pool_is_replaced_after_a_child_dies(app, teacher, monkeypatch):
+    monkeypatch.setitem(app.config, 'LOGIN_OFFLOAD_HASHING', True)
+    client = app.test_client()
+    assert client.post('/login', data=TEACHER_LOGIN).status_code == 302
+
+    kill_children(college.login_verifier._pool)
+    response = client.post('/login', data=TEACHER_LOGIN)
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert college.login_verifier.stats()['pool_failures'] == 1
+
+    assert client.post('/login', data=TEACHER_LOGIN).status_code == 302
+
+def test_import_hashes_inline_after_a_child_dies(teacher):
+    rows = [{'email_phone': f's{n}@x.com', 'password': 'pw1234', 'name': f'S{n}', 'roll_number': f'R{n}'}
+            for n in range(3)]
+    assert teacher.post('/teacher/import-students', json={'rows': rows[:2]}).status_code == 200
+
+    broken = college.get_hash_pool()
+    kill_children(broken)
+    response = teacher.post('/teacher/import-students', json={'rows': rows[2:] + [dict(rows[2], email_phone='s9@x.com', roll_number='R9')]})
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == 2
+    assert college.get_hash_pool() is not broken
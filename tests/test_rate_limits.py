@@ -0,0 +1,18 @@
+def test_anonymous_visitors_get_429_with_retry_after(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_IP', (0.5, 3))
+    statuses = [client.post('/chatbot/message', json={'message': 'fees'}).status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+
+    response = client.post('/chatbot/message/stream', json={'message': 'fees'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_limits_are_per_address(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_IP', (0.5, 1))
+    first = {'REMOTE_ADDR': '198.51.100.1'}
+    assert client.post('/chatbot/message', json={'message': 'fees'}, environ_base=first).status_code == 200
+    assert client.post('/chatbot/message', json={'message': 'fees'}, environ_base=first).status_code == 429
+    other = {'REMOTE_ADDR': '198.51.100.2'}
+    assert client.post('/chatbot/message', json={'message': 'fees'}, environ_base=other).status_code == 200
@@ -0,0 +1,9 @@
+def test_static_files_do_not_vary_on_the_session_cookie(teacher):
+    response = teacher.get('/static/css/style.css')
+    assert response.status_code == 200
+    assert 'Cookie' not in response.vary
+
+def test_pages_reading_the_session_vary_on_the_cookie(teacher):
+    response = teacher.get('/teacher/dashboard')
+    assert response.status_code == 200
+    assert 'Cookie' in response.vary
@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers
+
+Usage:
+    flask --app app init-db
+    gunicorn --preload --workers 4 --threads 8 --worker-class gthread wsgi:app
+"""
+
+from app import create_app
+
+app = create_app()